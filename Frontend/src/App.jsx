@@ -11,7 +11,12 @@ import axios from "axios";
 import { Layout } from "antd";
 import { Content } from "antd/lib/layout/layout";
 import { DeleteOutlined, SendOutlined } from "@ant-design/icons";
-import { API_BASE_URL, API_ENDPOINTS } from "./config/api";
+import {
+  API_BASE_URL,
+  API_ENDPOINTS,
+  rememberWorkspace,
+  workspaceHeaders,
+} from "./config/api";
 
 const { TextArea } = Input;
 const MAX_PROMPT_LENGTH = 1000;
@@ -31,12 +36,17 @@ class ErrorBoundary extends React.Component {
   async componentDidCatch(error, info) {
     this.setState({ hasError: true, error, info });
     try {
-      const res = await axios.post(API_ENDPOINTS.autoFixError, {
-        error_message: error.message,
-        stack_trace: info.componentStack,
-        file_content: "",
-        filename: "",
-      });
+      const res = await axios.post(
+        API_ENDPOINTS.autoFixError,
+        {
+          error_message: error.message,
+          stack_trace: info.componentStack,
+          file_content: "",
+          filename: "",
+        },
+        { headers: workspaceHeaders() }
+      );
+      rememberWorkspace(res);
       this.setState({ patch: res.data.patch, patchMsg: res.data.message });
     } catch (e) {
       this.setState({ patchMsg: "Failed to get auto-fix suggestion." });
@@ -180,9 +190,12 @@ const App = ({ prompt: initialPrompt, onClear }) => {
     setPreviewKey((prev) => prev + 1);
 
     try {
-      const response = await axios.post(API_ENDPOINTS.generate, {
-        prompt: prompt.trim(),
-      });
+      const response = await axios.post(
+        API_ENDPOINTS.generate,
+        { prompt: prompt.trim() },
+        { headers: workspaceHeaders() }
+      );
+      rememberWorkspace(response);
 
       // Clear the processing simulation
       clearInterval(stepInterval);
@@ -10,6 +10,7 @@ import { signOut } from "firebase/auth";
 import { auth } from "../firebase";
 import { useTheme } from "../context/ThemeContext";
 import { pushToGitHub, deployToVercel } from "../utils/deployment";
+import { API_ENDPOINTS, getWorkspaceId } from "../config/api";
 
 const { Header } = Layout;
 
@@ -221,7 +222,19 @@ const AppNavBar = () => {
           <div>
             {user && (
               <div className="m-3 ">
-                <a href="https://mvp-platform-project.onrender.com/download">
+                <a
+                  href={API_ENDPOINTS.download}
+                  onClick={(event) => {
+                    // The workspace is assigned by the first generation, after this renders
+                    event.preventDefault();
+                    const workspaceId = getWorkspaceId();
+                    if (!workspaceId) {
+                      message.info("Generate an app before downloading it.");
+                      return;
+                    }
+                    window.location.href = `${API_ENDPOINTS.download}?workspace=${encodeURIComponent(workspaceId)}`;
+                  }}
+                >
                   <Button
                     style={{
                       backgroundColor: "rgba(255, 255, 255, 0.1)",
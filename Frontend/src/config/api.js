@@ -22,6 +22,7 @@ export const API_BASE_URL = API_CONFIG.endpoints[API_CONFIG.environment];
 export const API_ENDPOINTS = {
   // Code Generation
   generate: `${API_BASE_URL}/generate`,
+  generateStream: `${API_BASE_URL}/generate/stream`,
 
   // File Operations
   files: `${API_BASE_URL}/files`,
@@ -29,7 +30,8 @@ export const API_ENDPOINTS = {
   updateFile: `${API_BASE_URL}/update_file`,
 
   // Preview
-  preview: (filename) => `${API_BASE_URL}/preview/${filename}`,
+  preview: (workspaceId, filename) =>
+    `${API_BASE_URL}/preview/${workspaceId}/${filename}`,
 
   // Auto-fix
   autoFixError: `${API_BASE_URL}/auto-fix-error`,
@@ -38,6 +40,26 @@ export const API_ENDPOINTS = {
   download: `${API_BASE_URL}/download`,
 };
 
+// The backend gives each session its own workspace; keep its ID for this tab
+const WORKSPACE_STORAGE_KEY = "workspaceId";
+
+export const getWorkspaceId = () => sessionStorage.getItem(WORKSPACE_STORAGE_KEY);
+
+// Headers that send the current workspace ID (none before the first request)
+export const workspaceHeaders = () => {
+  const workspaceId = getWorkspaceId();
+  return workspaceId ? { "X-Workspace-Id": workspaceId } : {};
+};
+
+// Store the workspace ID the backend assigned or confirmed in a response
+export const rememberWorkspace = (response) => {
+  const workspaceId =
+    response.headers["x-workspace-id"] || response.data?.workspace;
+  if (workspaceId) {
+    sessionStorage.setItem(WORKSPACE_STORAGE_KEY, workspaceId);
+  }
+};
+
 // Helper function to check if we're in development mode
 export const isDevelopment = () => API_CONFIG.environment === "local";
 
@@ -0,0 +1,79 @@
+"""Measure /generate/batch throughput (apps/min) across concurrency caps.
+
+Runs the app in-process against the deterministic fake LLM and submits the same
+number of prompts once per concurrency value. Note that LLM_MAX_IN_FLIGHT still
+bounds upstream calls across all items.
+
+Usage (from backend/):
+    python -m benchmarks.batch_throughput --prompts 32 --concurrency 1 4 8 16 --llm-latency 0.5
+"""
+import os
+import sys
+import json
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import httpx
+
+from benchmarks.common import start_server_in_thread, git_revision
+from benchmarks.fake_llm_server import create_fake_llm_app
+
+async def run(args) -> dict:
+    import main
+    logging.getLogger().setLevel(args.log_level)
+
+    runs = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for concurrency in args.concurrency:
+                prefix = f"bench-c{concurrency}"
+                request = {
+                    "prompts": [f"starter template {concurrency}-{index}" for index in range(args.prompts)],
+                    "workspace_prefix": prefix,
+                    "concurrency": concurrency,
+                    "bypass_cache": True,
+                }
+                done = None
+                async with client.stream("POST", "/generate/batch", json=request) as res:
+                    res.raise_for_status()
+                    async for line in res.aiter_lines():
+                        event = json.loads(line)
+                        if event["type"] == "done":
+                            done = event
+                runs.append(done)
+                for index in range(args.prompts):
+                    shutil.rmtree(os.path.join(main.WORKSPACES_DIR, f"{prefix}-{index}"), ignore_errors=True)
+    return {"git_revision": git_revision(), "prompts": args.prompts, "llm_latency": args.llm_latency, "runs": runs}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=32, help="Prompts per batch")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16], help="Caps to compare")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake LLM token rate (0 = instant)")
+    parser.add_argument("--missing-file-rate", type=float, default=0.0, help="Fraction of completions missing a file")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log-level", default="WARNING", help="Backend log level during the run")
+    args = parser.parse_args()
+
+    projects_dir = tempfile.mkdtemp(prefix="bench-projects-")
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["PROJECTS_DIR"] = projects_dir
+    os.environ.setdefault("GENERATE_BATCH_MAX_CONCURRENCY", str(max(args.concurrency)))
+    os.environ.setdefault("LLM_MAX_IN_FLIGHT", str(max(args.concurrency)))
+    start_server_in_thread(create_fake_llm_app(
+        latency=args.llm_latency, tokens_per_second=args.tokens_per_second, missing_file_rate=args.missing_file_rate
+    ), args.port)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        print(json.dumps(asyncio.run(run(args)), indent=2))
+    finally:
+        shutil.rmtree(projects_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,114 @@
+"""Measure cold start (process spawn to /readyz) and cross-worker cache hits of the real server.
+
+Starts ``uvicorn main:create_app --factory`` as a subprocess once per run and
+worker count, polls /readyz until the first worker answers and until every
+worker has reported ready, then sends the same /generate request repeatedly
+over fresh connections (so the kernel spreads them over the workers) and
+counts how many reached the fake LLM. With shared caches that is one call
+regardless of the worker count.
+
+Usage (from backend/):
+    python -m benchmarks.cold_start --workers 1 4 --runs 3
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+from benchmarks.common import start_server_in_thread, summarize, git_revision
+from benchmarks.fake_llm_server import create_fake_llm_app
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_until_ready(base_url: str, workers: int, timeout: float) -> dict:
+    """Poll /readyz; returns seconds until the first and until ``workers`` distinct processes were ready."""
+    started = time.perf_counter()
+    first = None
+    pids = set()
+    while time.perf_counter() - started < timeout:
+        try:
+            # A new connection per probe lets each worker answer some of them
+            res = httpx.get(f"{base_url}/readyz", timeout=1.0)
+            if res.status_code == 200:
+                pids.add(res.json()["pid"])
+                if first is None:
+                    first = time.perf_counter() - started
+                if len(pids) >= workers:
+                    return {"first_ready_s": round(first, 3), "all_ready_s": round(time.perf_counter() - started, 3)}
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{len(pids)}/{workers} workers ready after {timeout}s")
+
+def measure(args, workers: int, check_cache: bool) -> dict:
+    projects_dir = tempfile.mkdtemp(prefix="bench-projects-")
+    env = dict(
+        os.environ,
+        PROJECTS_DIR=projects_dir,
+        GROQ_API_URL=f"http://127.0.0.1:{args.fake_port}/v1/chat/completions",
+        GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "benchmark"),
+        PYTHONPATH=BACKEND_DIR,
+    )
+    command = [
+        sys.executable, "-m", "uvicorn", "main:create_app", "--factory",
+        "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = wait_until_ready(base_url, workers, args.timeout)
+        if check_cache:
+            fake_url = f"http://127.0.0.1:{args.fake_port}/stats"
+            before = httpx.get(fake_url).json()["requests"]
+            for index in range(args.requests):
+                res = httpx.post(
+                    f"{base_url}/generate", params={"workspace": f"cold-{index}"}, json={"prompt": "cold start app"},
+                    timeout=60.0,
+                )
+                res.raise_for_status()
+            upstream = httpx.get(fake_url).json()["requests"] - before
+            result["cache"] = {
+                "requests": args.requests,
+                "upstream_calls": upstream,
+                "hit_rate": round(1 - upstream / args.requests, 3),
+            }
+        return result
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(projects_dir, ignore_errors=True)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Worker counts to compare")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per worker count")
+    parser.add_argument("--requests", type=int, default=16, help="Identical /generate requests for the cache check")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for readiness")
+    parser.add_argument("--port", type=int, default=8801, help="Port for the backend under test")
+    parser.add_argument("--fake-port", type=int, default=8766, help="Port for the fake LLM server")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM latency in seconds")
+    args = parser.parse_args()
+
+    start_server_in_thread(create_fake_llm_app(latency=args.llm_latency), args.fake_port)
+    report = {"git_revision": git_revision(), "runs": args.runs, "workers": {}}
+    for workers in args.workers:
+        runs = [measure(args, workers, check_cache=index == args.runs - 1) for index in range(args.runs)]
+        report["workers"][str(workers)] = {
+            "first_ready_ms": summarize([run["first_ready_s"] * 1000 for run in runs]),
+            "all_ready_ms": summarize([run["all_ready_s"] * 1000 for run in runs]),
+            "cache": runs[-1].get("cache"),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main_cli()
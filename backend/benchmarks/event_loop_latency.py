@@ -0,0 +1,78 @@
+"""Measure event-loop lag of the backend under mixed /generate + /download load.
+
+Runs the FastAPI app in-process against a fake OpenAI-compatible server that
+returns large generated files, and samples how late a periodic timer fires
+while the requests are in flight.
+
+Usage (from backend/):
+    python -m benchmarks.event_loop_latency --requests 20 --file-kb 512
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+
+import httpx
+
+from benchmarks.common import start_server_in_thread, sample_loop_lag, summarize
+from benchmarks.fake_llm_server import create_fake_llm_app
+
+async def run(args):
+    import main
+    logging.getLogger().setLevel(args.log_level)
+
+    lag_samples = []
+    stop = asyncio.Event()
+    workspaces = [f"bench-{i}" for i in range(args.requests)]
+
+    async def generate(client, workspace):
+        res = await client.post("/generate", params={"workspace": workspace}, json={"prompt": workspace, "bypass_cache": True})
+        res.raise_for_status()
+
+    async def download(client, workspace):
+        res = await client.get("/download", params={"workspace": workspace})
+        res.raise_for_status()
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            sampler = asyncio.create_task(sample_loop_lag(args.interval / 1000, lag_samples, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(generate(client, ws) for ws in workspaces))
+            await asyncio.gather(*(download(client, ws) for ws in workspaces), *(generate(client, ws) for ws in workspaces))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+
+    for workspace in workspaces:
+        shutil.rmtree(os.path.join(main.WORKSPACES_DIR, workspace), ignore_errors=True)
+
+    return {
+        "requests": args.requests * 3,
+        "file_kb": args.file_kb,
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_ms": summarize(lag_samples),
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="Concurrent /generate requests per phase")
+    parser.add_argument("--file-kb", type=int, default=256, help="Size of each generated file in KiB")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM latency in seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="Lag sampling interval in ms")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log-level", default="WARNING", help="Backend log level during the run")
+    args = parser.parse_args()
+
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+    os.environ.setdefault("WORKSPACE_QUOTA_BYTES", str(1024 * 1024 * 1024))
+    start_server_in_thread(create_fake_llm_app(latency=args.llm_latency, file_kb=args.file_kb), args.port)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,152 @@
+"""Deterministic fake OpenAI-compatible chat completions server for benchmarks.
+
+Completions are built from the stub in ``generators/prompt_to_code.py``. Latency,
+token rate, failure rate and missing-file rate are configurable, and every
+random decision is derived from the seed and the prompt so runs are repeatable.
+
+Usage (from backend/):
+    python -m benchmarks.fake_llm_server --port 8765 --latency 0.2 --tokens-per-second 500
+"""
+import re
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import defaultdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from generators.prompt_to_code import generate_code_from_prompt
+
+MISSING_FILES_PATTERN = re.compile(r"Generate these missing files: (.*)$", re.MULTILINE)
+EXCERPT_LINE_PATTERN = re.compile(r"^\s*(\d+)\| (.*)$", re.MULTILINE)
+
+def build_patch(prompt: str) -> str:
+    """Answer a patch-mode auto-fix prompt with a one-line diff against the excerpt."""
+    lines = EXCERPT_LINE_PATTERN.findall(prompt)
+    if not lines:
+        return "No changes needed."
+    number, line = lines[len(lines) // 2]
+    return f"```diff\n@@ -{number},1 +{number},1 @@\n-{line}\n+{line} // fixed\n```\n"
+
+def create_fake_llm_app(latency: float = 0.1, tokens_per_second: float = 0.0, failure_rate: float = 0.0,
+                        missing_file_rate: float = 0.0, file_kb: int = 0, seed: int = 0, tail_rate: float = 0.0,
+                        tail_latency: float = 0.0) -> FastAPI:
+    """Build the fake server.
+
+    ``tokens_per_second`` of 0 returns completions instantly after ``latency``;
+    ``file_kb`` pads each generated file to roughly that size. A ``tail_rate``
+    fraction of requests waits an extra ``tail_latency`` seconds (a slow replica).
+    """
+    app = FastAPI()
+    seen = defaultdict(int)
+    stats = {"requests": 0, "failures": 0, "missing_file_responses": 0, "truncated": 0, "slow_responses": 0,
+             "prompt_tokens": 0, "completion_tokens": 0}
+
+    def rng_for(prompt: str) -> random.Random:
+        # Same prompt + same attempt number -> same decisions, independent of request interleaving
+        digest = hashlib.sha256(f"{seed}:{prompt}".encode()).hexdigest()
+        seen[digest] += 1
+        return random.Random(f"{digest}:{seen[digest]}")
+
+    def build_content(prompt: str, rng: random.Random) -> str:
+        files = generate_code_from_prompt(prompt[:80])
+        if file_kb:
+            padding = "// padding line for benchmark payloads\n" * (file_kb * 1024 // 40)
+            files = {name: f"{code}\n{padding}" for name, code in files.items()}
+        requested = MISSING_FILES_PATTERN.search(prompt)
+        if requested:
+            names = requested.group(1).split(", ")
+            files = {name: files.get(name, f"// {name}") for name in names}
+        elif rng.random() < missing_file_rate:
+            stats["missing_file_responses"] += 1
+            dropped = rng.choice(sorted(files))
+            files = {name: code for name, code in files.items() if name != dropped}
+        blocks = "\n\n".join(f"```{name}\n{code}\n```" for name, code in files.items())
+        return f"I understand you want to create {prompt[:40]}. Here is the application.\n\n{blocks}\n"
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        prompt = body["messages"][-1]["content"]
+        rng = rng_for(prompt)
+        delay = latency
+        if rng.random() < tail_rate:
+            stats["slow_responses"] += 1
+            delay += tail_latency
+        await asyncio.sleep(delay)
+        if rng.random() < failure_rate:
+            stats["failures"] += 1
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"retry-after": "0.1"})
+
+        system_prompt = body["messages"][0]["content"]
+        content = build_patch(prompt) if "unified diff of the file" in system_prompt else build_content(prompt, rng)
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(content) > body["max_tokens"] * 4:
+            # Cut off like a real provider does at max_tokens
+            stats["truncated"] += 1
+            content = content[:body["max_tokens"] * 4]
+            finish_reason = "length"
+        completion_tokens = len(content) // 4
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        generation_time = completion_tokens / tokens_per_second if tokens_per_second else 0.0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if body.get("stream"):
+            async def events():
+                chunk_size = 64
+                chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+                delay = generation_time / len(chunks) if chunks else 0.0
+                for chunk in chunks:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n"
+                yield f"data: {json.dumps({'choices': [{'delta': {}, 'finish_reason': finish_reason}]})}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        if generation_time:
+            await asyncio.sleep(generation_time)
+        return {
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": usage,
+        }
+
+    return app
+
+def main_cli():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Completion token rate (0 = instant)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--missing-file-rate", type=float, default=0.0, help="Fraction of completions missing a file")
+    parser.add_argument("--file-kb", type=int, default=0, help="Pad each generated file to about this size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of requests with extra latency")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="Extra seconds for slow requests")
+    args = parser.parse_args()
+    app = create_fake_llm_app(
+        args.latency, args.tokens_per_second, args.failure_rate, args.missing_file_rate, args.file_kb, args.seed,
+        args.tail_rate, args.tail_latency,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main_cli()
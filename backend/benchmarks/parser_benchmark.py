@@ -0,0 +1,86 @@
+"""Compare the fenced code block parser with the regex it replaced.
+
+Builds synthetic completions of several sizes (prose, many files, a README with
+nested fences) and times the previous ``[\\s\\S]+?`` regex, the single-pass
+parser on str and bytes, and the incremental parser fed in small chunks.
+
+Usage (from backend/):
+    python -m benchmarks.parser_benchmark --sizes-mb 1 4 16
+"""
+import re
+import sys
+import json
+import time
+import argparse
+
+from utils.code_parser import IncrementalCodeBlockParser, parse_code_blocks
+
+LEGACY_PATTERN = re.compile(r"```([\w.\-/+]+)\n([\s\S]+?)```")
+
+def legacy_parse(text: str) -> dict:
+    files = {}
+    for filename, code in LEGACY_PATTERN.findall(text):
+        filename, code = filename.strip(), code.strip()
+        if filename and code:
+            files[filename] = code
+    return files
+
+def incremental_parse(text: str, chunk_size: int) -> dict:
+    parser = IncrementalCodeBlockParser()
+    files = {}
+    for start in range(0, len(text), chunk_size):
+        files.update(parser.feed(text[start:start + chunk_size]))
+    files.update(parser.close())
+    return files
+
+def build_completion(size_mb: float, files: int) -> str:
+    line = "    const value = compute(items.map((item) => item.id), { retries: 3 });\n"
+    lines_per_file = max(1, int(size_mb * 1024 * 1024 / files / len(line)))
+    body = line * lines_per_file
+    parts = ["Here is your application.\n"]
+    for index in range(files):
+        parts.append(f"Explanation for file {index}.\n```src/module{index}.js\n{body}```\n")
+    parts.append("````README.md\n# Setup\n```bash\nnpm install\n```\n````\n")
+    return "".join(parts)
+
+def time_call(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--files", type=int, default=12, help="Code blocks per completion")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Characters per incremental feed")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    results = []
+    for size_mb in args.sizes_mb:
+        text = build_completion(size_mb, args.files)
+        encoded = text.encode("utf-8")
+        parsed = parse_code_blocks(text)
+        legacy = legacy_parse(text)
+        timings = {
+            "legacy_regex": time_call(lambda: legacy_parse(text), args.repeat),
+            "single_pass": time_call(lambda: parse_code_blocks(text), args.repeat),
+            "single_pass_bytes": time_call(lambda: parse_code_blocks(encoded), args.repeat),
+            "incremental": time_call(lambda: incremental_parse(text, args.chunk_size), args.repeat),
+        }
+        results.append({
+            "size_mb": round(len(encoded) / 1024 / 1024, 2),
+            "files_parsed": len(parsed),
+            # The regex cuts README.md at its inner fence; the parser keeps it whole
+            "readme_intact": parsed.get("README.md", "").endswith("```") and not legacy.get("README.md", "").endswith("```"),
+            "ms": {name: round(seconds * 1000, 2) for name, seconds in timings.items()},
+            "mb_per_s": {name: round(len(encoded) / 1024 / 1024 / seconds, 1) for name, seconds in timings.items()},
+        })
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,274 @@
+"""Reproducible end-to-end benchmark of the backend against a deterministic fake LLM.
+
+Drives a weighted mix of /generate, /auto-fix-error, /file, /update_file and
+/download requests at a fixed concurrency through the app in-process (with its
+lifespan), and reports import and startup time, per-endpoint latency
+percentiles, throughput, error rates, event-loop lag and memory. Projects are written to a temporary
+directory, and the operation sequence is derived from --seed so two runs with
+the same arguments issue the same requests.
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmark --requests 200 --concurrency 16 --output results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import start_server_in_thread, sample_loop_lag, summarize, git_revision
+from benchmarks.fake_llm_server import create_fake_llm_app
+
+DEFAULT_MIX = "generate=2,auto_fix=1,read_file=4,update_file=2,download=1"
+
+SAMPLE_STACK_TRACE = """TypeError: Cannot read properties of undefined (reading 'map')
+    at App (src/App.js:12:18)
+    at renderWithHooks (react-dom.development.js:14985:18)"""
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+async def op_generate(client, workspace: str, index: int, args):
+    # A small pool of prompts so repeated ones exercise the response cache
+    prompt = f"benchmark app {index % args.distinct_prompts}"
+    return await client.post(
+        "/generate", params={"workspace": workspace}, json={"prompt": prompt, "bypass_cache": args.bypass_cache}
+    )
+
+async def op_auto_fix(client, workspace: str, index: int, args):
+    request = {
+        "error_message": f"TypeError: Cannot read properties of undefined (reading 'map') #{index % args.distinct_prompts}",
+        "stack_trace": SAMPLE_STACK_TRACE,
+        "filename": "src/App.js",
+        "mode": args.auto_fix_mode,
+    }
+    if args.auto_fix_mode == "suggest":
+        # Suggest mode only sees the code the client sends
+        res = await client.get("/file", params={"workspace": workspace, "name": "src/App.js"})
+        request["file_content"] = res.json().get("content", "")
+    return await client.post("/auto-fix-error", params={"workspace": workspace}, json=request)
+
+async def op_read_file(client, workspace: str, index: int, args):
+    return await client.get("/file", params={"workspace": workspace, "name": "src/App.js"})
+
+async def op_update_file(client, workspace: str, index: int, args):
+    return await client.post("/update_file", params={"workspace": workspace}, json={
+        "filename": "src/App.css",
+        "content": f".App {{ padding: {index % 32}px; }}\n" * 64,
+    })
+
+async def op_download(client, workspace: str, index: int, args):
+    return await client.get("/download", params={"workspace": workspace})
+
+OPERATIONS = {
+    "generate": op_generate,
+    "auto_fix": op_auto_fix,
+    "read_file": op_read_file,
+    "update_file": op_update_file,
+    "download": op_download,
+}
+
+def build_schedule(args, weights: dict) -> list:
+    rng = random.Random(args.seed)
+    names = sorted(weights)
+    chosen = rng.choices(names, weights=[weights[name] for name in names], k=args.requests)
+    return [(name, f"bench-{rng.randrange(args.workspaces)}", index) for index, name in enumerate(chosen)]
+
+async def run(args) -> dict:
+    import_started = time.perf_counter()
+    import main
+    import_elapsed = time.perf_counter() - import_started
+    app = main.create_app()
+    logging.getLogger().setLevel(args.log_level)
+
+    weights = parse_mix(args.mix)
+    schedule = build_schedule(args, weights)
+    workspaces = sorted({f"bench-{i}" for i in range(args.workspaces)})
+    latencies = defaultdict(list)
+    errors = defaultdict(lambda: defaultdict(int))
+    lag_samples = []
+    stop = asyncio.Event()
+
+    async def timed(client, name: str, workspace: str, index: int, operation=None):
+        started = time.perf_counter()
+        try:
+            res = await (operation or OPERATIONS[name])(client, workspace, index, args)
+            # Drain the body so streamed responses are measured end to end
+            await res.aread()
+            if res.status_code >= 400:
+                errors[name][str(res.status_code)] += 1
+        except Exception as e:
+            errors[name][type(e).__name__] += 1
+        latencies[name].append((time.perf_counter() - started) * 1000)
+
+    async def worker(client, queue: asyncio.Queue):
+        while True:
+            try:
+                name, workspace, index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await timed(client, name, workspace, index)
+
+    tracemalloc.start()
+    async with app.router.lifespan_context(app):
+        startup_elapsed = app.state.startup_seconds
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            # Seed every workspace so reads, updates and downloads have files to work on
+            setup_started = time.perf_counter()
+            for workspace in workspaces:
+                await timed(client, "setup", workspace, 0, op_generate)
+            setup_elapsed = time.perf_counter() - setup_started
+            latencies.pop("setup", None)
+            setup_errors = dict(errors.pop("setup", {}))
+
+            queue = asyncio.Queue()
+            for item in schedule:
+                queue.put_nowait(item)
+            tracemalloc.reset_peak()
+            sampler = asyncio.create_task(sample_loop_lag(args.interval / 1000, lag_samples, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client, queue) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+            cache_stats = main.llm_cache_stats()
+            scheduler_stats = main.llm_scheduler_stats()
+            route_stats = main.llm_route_stats()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    async with httpx.AsyncClient() as fake_client:
+        fake_stats = (await fake_client.get(f"http://127.0.0.1:{args.port}/stats")).json()
+
+    total = sum(len(values) for values in latencies.values())
+    failed = sum(sum(by_status.values()) for by_status in errors.values())
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        # In-process cold start; benchmarks.cold_start measures whole server processes
+        "cold_start_ms": {
+            "import": round(import_elapsed * 1000, 1),
+            "startup": round(startup_elapsed * 1000, 1),
+        },
+        "setup_s": round(setup_elapsed, 3),
+        "setup_errors": setup_errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "endpoints": {
+            name: {
+                "latency_ms": summarize(values),
+                "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "errors": dict(errors.get(name, {})),
+            }
+            for name, values in sorted(latencies.items())
+        },
+        "loop_lag_ms": summarize(lag_samples),
+        "memory": {
+            "tracemalloc_peak_mb": round(peak_bytes / 1024 / 1024, 2),
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            "max_rss_mb": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 2
+            ),
+        },
+        "llm_cache": cache_stats,
+        "llm_scheduler": scheduler_stats,
+        "llm_routes": route_stats,
+        "fake_llm": fake_stats,
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Operations to issue after setup")
+    parser.add_argument("--concurrency", type=int, default=16, help="Operations in flight at once")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operation mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--workspaces", type=int, default=8, help="Workspaces the operations are spread over")
+    parser.add_argument("--distinct-prompts", type=int, default=8, help="Prompt variety; lower means more cache hits")
+    parser.add_argument("--auto-fix-mode", choices=["suggest", "patch"], default="patch",
+                        help="suggest sends the whole file, patch sends an excerpt and applies a diff")
+    parser.add_argument("--bypass-cache", action="store_true", help="Send bypass_cache with every /generate")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Fake LLM time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake LLM token rate (0 = instant)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake LLM calls answered with 429")
+    parser.add_argument("--missing-file-rate", type=float, default=0.0, help="Fraction of completions missing a file")
+    parser.add_argument("--file-kb", type=int, default=0, help="Pad each generated file to about this size")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of fake LLM calls with extra latency")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="Extra seconds for slow fake LLM calls")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged LLM requests to an alternate model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=5.0, help="Event-loop lag sampling interval in ms")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the fake LLM server")
+    parser.add_argument("--output", help="Also write the JSON report to this path")
+    parser.add_argument("--keep-projects", action="store_true", help="Keep the temporary projects directory")
+    parser.add_argument("--log-level", default="WARNING", help="Backend log level during the run")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    projects_dir = tempfile.mkdtemp(prefix="bench-projects-")
+    # Must be configured before main is imported
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["PROJECTS_DIR"] = projects_dir
+    os.environ.setdefault("WORKSPACE_QUOTA_BYTES", str(1024 * 1024 * 1024))
+    os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.05")
+    os.environ.pop("LLM_CACHE_DB", None)
+    if args.hedge:
+        os.environ["LLM_HEDGE"] = "true"
+        os.environ.setdefault("LLM_HEDGE_MIN_SAMPLES", "10")
+        os.environ.setdefault("LLM_HEDGE_MIN_DELAY", "0")
+        for route in ("GENERATE", "AUTO_FIX"):
+            os.environ.setdefault(f"LLM_ROUTE_{route}", "groq:fake-primary,groq:fake-alternate")
+    start_server_in_thread(create_fake_llm_app(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        missing_file_rate=args.missing_file_rate,
+        file_kb=args.file_kb,
+        seed=args.seed,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+    ), args.port)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if not args.keep_projects:
+            shutil.rmtree(projects_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main_cli()
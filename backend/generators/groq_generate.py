@@ -1,38 +1,38 @@
 import httpx
-import os
+from utils.code_parser import iter_code_blocks
+from utils.llm_router import create_llm_router
 
-GROQ_API_KEY = "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"  # Store in .env or shell
-GROQ_MODEL = "gemma2-9b-it"
-
-def generate_code_from_prompt(prompt: str) -> dict:
-    system_prompt = (
-        "You're an expert fullstack developer. Given a prompt like "
-        "'a voice-controlled planner', generate a working MVP with HTML/CSS, React code, and backend code. "
-        "Output each file in markdown fenced code blocks like: ```filename.ext\ncode\n```"
-    )
-
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+SYSTEM_PROMPT = (
+    "You're an expert fullstack developer. Given a prompt like "
+    "'a voice-controlled planner', generate a working MVP with HTML/CSS, React code, and backend code. "
+    "Output each file in markdown fenced code blocks like: ```filename.ext\ncode\n```"
+)
 
+async def generate_code_from_prompt(prompt: str, client: httpx.AsyncClient = None) -> dict:
+    """Generate an app with the ``generate`` route's primary model (API keys come from ``<PROVIDER>_API_KEY``)."""
+    target = create_llm_router().route("generate").primary
     body = {
-        "model": GROQ_MODEL,
+        "model": target.model,
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
     }
 
-    with httpx.Client(timeout=60) as client:
-        res = client.post("https://api.groq.com/openai/v1/chat/completions", json=body, headers=headers)
-        data = res.json()
-    
+    if client is None:
+        async with httpx.AsyncClient(timeout=60) as own_client:
+            res = await own_client.post(target.provider.url, json=body, headers=target.provider.headers())
+    else:
+        res = await client.post(target.provider.url, json=body, headers=target.provider.headers())
+    res.raise_for_status()
+    data = res.json()
+
     content = data["choices"][0]["message"]["content"]
     return parse_fenced_code_blocks(content)
 
 def parse_fenced_code_blocks(text: str) -> dict:
-    import re
-    pattern = r"```([\w./+-]*)\n([\s\S]+?)```"
-    matches = re.findall(pattern, text)
-    return {filename.strip() or f"file{idx}.txt": code.strip() for idx, (filename, code) in enumerate(matches)}
+    # Unnamed blocks are kept under placeholder names
+    return {
+        block.filename or f"file{idx}.txt": block.code(text)
+        for idx, block in enumerate(iter_code_blocks(text))
+    }
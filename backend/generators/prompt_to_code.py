@@ -1,6 +1,10 @@
 # Stub: Replace with actual LLM call
 def generate_code_from_prompt(prompt: str) -> dict:
     return {
-        "index.html": f"<!DOCTYPE html><html><body><h1>{prompt}</h1></body></html>",
-        "App.js": "import React from 'react';\nexport default function App() { return <h1>Hello</h1>; }",
+        "public/index.html": f"<!DOCTYPE html><html><body><div id=\"root\"></div><h1>{prompt}</h1></body></html>",
+        "src/App.js": "import React from 'react';\nimport './App.css';\nexport default function App() { return <h1>Hello</h1>; }",
+        "src/index.js": "import React from 'react';\nimport ReactDOM from 'react-dom/client';\nimport './index.css';\nimport App from './App';\nReactDOM.createRoot(document.getElementById('root')).render(<App />);",
+        "src/App.css": "h1 { color: #333; }",
+        "src/index.css": ":root { --primary: #4f46e5; }\nbody { margin: 0; font-family: sans-serif; }",
+        "src/server.js": "const express = require('express');\nconst app = express();\napp.get('/api/health', (req, res) => res.json({ ok: true }));\napp.listen(5000);",
     }
@@ -1,50 +1,185 @@
 import os
-import re
+import json
+import time
 import httpx
 import logging
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+import asyncio
+import secrets
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from fastapi.responses import FileResponse, JSONResponse
-from utils.file_utils import save_file, list_files, get_file_content, setup_project_structure
-from fastapi.responses import FileResponse
-import shutil
+from typing import List, Literal
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response, PlainTextResponse
+from utils.file_utils import (
+    normalize_filename, run_file_io, write_files_atomic, rollback_snapshot, workspace_write_lock, forget_workspace_lock,
+    get_file_content_async, shutdown_file_io_executor,
+)
+from utils.http_client import create_http_client, get_pool_stats
+from utils.llm_cache import create_llm_cache, make_cache_key
+from utils.llm_scheduler import create_llm_scheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from utils.llm_router import ROUTE_NAMES, create_llm_router
+from utils.code_parser import IncrementalCodeBlockParser, parse_code_blocks
+from utils.patching import PatchError, apply_unified_diff, build_context_excerpt, extract_diff, parse_unified_diff, stack_trace_lines
+from utils.config import env_int, env_bool
+from utils.file_index import create_file_index_manager
+from utils.content_cache import create_content_cache
+from utils.job_queue import create_job_queue
+from utils.version_store import MissingBlobError, create_version_store
+from utils.prompts import (
+    PromptTemplate, count_tokens, create_token_budget, GENERATION_SYSTEM_PROMPT, COMPLETION_SYSTEM_PROMPT,
+    AUTO_FIX_SYSTEM_PROMPT, AUTO_FIX_PATCH_SYSTEM_PROMPT, COMPLETION_PROMPT, RETRY_NOTE, AUTO_FIX_PROMPT,
+    AUTO_FIX_PATCH_PROMPT,
+)
+from utils.http_cache import make_etag, etag_matches, http_date, not_modified_since, parse_range, choose_encoding
+from utils.metrics import (
+    registry, span, traced, current_endpoint, HTTP_REQUEST_DURATION, SPAN_DURATION, LLM_REQUEST_DURATION,
+    LLM_TOKENS, LLM_TRUNCATIONS, GENERATION_ATTEMPTS, GENERATION_RETRIES,
+)
+from utils.workspaces import (
+    WORKSPACE_ID_PATTERN, Workspace, WorkspaceNotFoundError, WorkspaceQuotaError, create_workspace_manager,
+    new_workspace_id,
+)
+from utils.zip_stream import build_manifest, manifest_hash, iter_zip_chunks, iter_and_cache, create_archive_cache
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file; the settings below are read at import
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from pathlib import Path
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build every per-process resource, then report ready; runs in each worker after the fork."""
+    started = time.perf_counter()
+    app.state.ready = False
+    await run_file_io(workspace_manager.load)
+    await run_file_io(version_store.load)
+    # One pooled client for the whole process so LLM calls reuse connections
+    app.state.http_client = create_http_client()
+    # The cache's disk tier and the rate limits live in SQLite files, shared by however many workers the server runs
+    app.state.llm_cache = create_llm_cache(os.path.join(BASE_DIR, "llm_cache.db"))
+    app.state.llm_scheduler = create_llm_scheduler(os.path.join(BASE_DIR, "rate_limits.db"))
+    app.state.llm_router = create_llm_router()
+    app.state.archive_cache = create_archive_cache()
+    app.state.job_queue = create_job_queue(os.path.join(BASE_DIR, "jobs.db"))
+    app.state.job_queue.register("generate", run_generation_job)
+    await app.state.job_queue.start()
+    eviction_task = asyncio.create_task(evict_idle_workspaces())
+    app.state.startup_seconds = time.perf_counter() - started
+    app.state.ready = True
+    logger.info(f"Worker {os.getpid()} ready in {app.state.startup_seconds * 1000:.1f} ms")
+    try:
+        yield
+    finally:
+        # Fail readiness first so load balancers stop routing here while we drain
+        app.state.ready = False
+        eviction_task.cancel()
+        # Running jobs are handed back to the queue and resumed on the next start
+        await app.state.job_queue.stop()
+        app.state.job_queue.store.close()
+        await app.state.http_client.aclose()
+        logger.info("Closed pooled HTTP client")
+        if app.state.llm_cache is not None:
+            app.state.llm_cache.close()
+        app.state.llm_scheduler.close()
+        shutdown_file_io_executor()
 
-# Get current file path
-current_dir = Path(__file__).resolve().parent
+def create_app() -> FastAPI:
+    """Build the ASGI app; serve it with ``uvicorn main:create_app --factory`` (or ``main:app``).
 
-app = FastAPI()
+    Importing this module only defines routes and settings. Directories,
+    clients, caches and the job queue are set up by the lifespan, in each
+    worker process. Helpers reach the app's state through the module-level
+    ``app``, so there is one app per process.
+    """
+    global app
+    logging.basicConfig(level=logging.INFO)
+    app = FastAPI(lifespan=lifespan)
+    # CORS config
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Workspace-Id"],
+    )
+    app.middleware("http")(record_request_metrics)
+    app.include_router(api)
+    return app
 
-# CORS config
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def __getattr__(name: str):
+    # ``main:app`` builds the app on first access instead of at import
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Project directories
-BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "projects")
-PROJECT_DIR, PUBLIC_DIR = setup_project_structure(BASE_DIR)
+api = APIRouter()
+
+async def record_request_metrics(request: Request, call_next):
+    token = current_endpoint.set(request.url.path)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+        current_endpoint.reset(token)
+
+# Project directories: one isolated workspace per session under projects/workspaces/
+BASE_DIR = os.environ.get("PROJECTS_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "projects")
+WORKSPACES_DIR = os.path.join(BASE_DIR, "workspaces")
+workspace_manager = create_workspace_manager(WORKSPACES_DIR)
+file_indexes = create_file_index_manager()
+content_cache = create_content_cache()
+# Deduplicated file history of every workspace, shared by all of them
+version_store = create_version_store(os.path.join(BASE_DIR, "store"))
+WORKSPACE_EVICTION_INTERVAL = env_int("WORKSPACE_EVICTION_INTERVAL", 300)
+# Flush staged files to disk before committing a workspace write
+WORKSPACE_FSYNC = env_bool("WORKSPACE_FSYNC", False)
+# Parallelism and size limits for /generate/batch
+GENERATE_BATCH_CONCURRENCY = env_int("GENERATE_BATCH_CONCURRENCY", 4)
+GENERATE_BATCH_MAX_CONCURRENCY = env_int("GENERATE_BATCH_MAX_CONCURRENCY", 16)
+GENERATE_BATCH_MAX_ITEMS = env_int("GENERATE_BATCH_MAX_ITEMS", 100)
+# Splits the model's context window between prompt and completion
+token_budget = create_token_budget()
+# Completion tokens expected for the text part of a generation (summary and suggestions)
+GENERATION_TEXT_TOKENS = 400
+REQUIRED_FILES = ('public/index.html', 'src/App.js', 'src/index.js', 'src/App.css', 'src/index.css', 'src/server.js')
+# Lines sent on each side of a stack-trace location by patch-mode auto-fix
+AUTO_FIX_CONTEXT_LINES = env_int("AUTO_FIX_CONTEXT_LINES", 20)
+# Lower bound on an auto-fix completion: the model reasons about the error before it answers
+AUTO_FIX_MIN_OUTPUT_TOKENS = env_int("AUTO_FIX_MIN_OUTPUT_TOKENS", 4000)
 
 # === Config ===
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-GROQ_MODEL = "qwen/qwen3-32b"  # Valid Groq models: llama-3.3-70b-versatile, llama3-8b-8192, mixtral-8x7b-32768
+# Providers, models and API keys are configured through utils/llm_router.py (LLM_PROVIDERS, LLM_ROUTE_*)
+# Logging raw completions costs I/O on every call, so it is opt-in
+LOG_RAW_LLM_RESPONSES = env_bool('LOG_RAW_LLM_RESPONSES', False)
 
 # === Request Models ===
 class PromptRequest(BaseModel):
     prompt: str
+    bypass_cache: bool = False
+    # "complete" keeps parsed files and asks only for missing ones; "full" regenerates everything
+    retry_mode: Literal["complete", "full"] = "complete"
+
+class BatchGenerateRequest(BaseModel):
+    prompts: List[str]
+    # Item i is written to workspace "<workspace_prefix>-<i>"; a random prefix is used if omitted
+    workspace_prefix: str = None
+    # Items generated at once; defaults to GENERATE_BATCH_CONCURRENCY
+    concurrency: int = None
+    bypass_cache: bool = False
+    retry_mode: Literal["complete", "full"] = "complete"
 
 class UpdateFileRequest(BaseModel):
     filename: str
@@ -55,40 +190,216 @@ class AutoFixErrorRequest(BaseModel):
     stack_trace: str
     file_content: str = ""
     filename: str = ""
+    bypass_cache: bool = False
+    # "suggest" returns free-form fixed code; "patch" requests a unified diff and applies it to the file
+    mode: Literal["suggest", "patch"] = "suggest"
+    # Validate and return the patched content without writing it to the workspace
+    dry_run: bool = False
 
 # === Utility Functions ===
+def requested_workspace_id(
+    workspace: str = Query(None, description="Workspace (session/project) ID"),
+    x_workspace_id: str = Header(None),
+):
+    """The workspace ID from the ``workspace`` query parameter or X-Workspace-Id header, if any."""
+    return workspace or x_workspace_id
+
+def open_workspace(workspace_id: str) -> Workspace:
+    """Resolve an existing workspace for a read: 400 without an ID, 404 if it does not exist."""
+    if not workspace_id:
+        raise HTTPException(
+            status_code=400, detail="Workspace ID required: pass the workspace parameter or X-Workspace-Id header"
+        )
+    try:
+        return workspace_manager.resolve(workspace_id, create=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def get_workspace(workspace_id: str = Depends(requested_workspace_id)) -> Workspace:
+    """The caller's existing workspace; reads never create one."""
+    return open_workspace(workspace_id)
+
+def get_or_create_workspace(response: Response, workspace_id: str = Depends(requested_workspace_id)) -> Workspace:
+    """The caller's workspace for a write, creating it if needed.
+
+    Callers without an ID get a new workspace; its ID comes back in the X-Workspace-Id
+    response header (and in the body of the generation endpoints).
+    """
+    try:
+        resolved = workspace_manager.resolve(workspace_id or new_workspace_id())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["X-Workspace-Id"] = resolved.id
+    return resolved
+
+def get_path_workspace(workspace_id: str) -> Workspace:
+    """Resolve a workspace named in the URL path, so relative links inside a preview keep it."""
+    return open_workspace(workspace_id)
+
+def lookup_workspace_file(workspace: Workspace, name: str):
+    """Resolve a client file name through the file index, probing the disk only on a miss."""
+    index = file_indexes.get(workspace)
+    entry = index.lookup(name)
+    if entry is None:
+        location = workspace.split_path(name)
+        if location is not None and os.path.isfile(os.path.join(*location)):
+            entry = index.record_write(os.path.normpath(os.path.join(*location)))
+    return entry
+
+def record_workspace_writes(workspace: Workspace, contents: dict, touched=()):
+    """Update the file index and preview cache after writing ``{filepath: content}`` through the API.
+
+    Caching here means the compressed preview variants are built at write time.
+    Paths in ``touched`` changed without their content at hand (removed, or
+    restored by a rollback) and are re-read from disk.
+    """
+    index = file_indexes.get(workspace)
+    for filepath in touched:
+        index.record_write(filepath)
+        content_cache.invalidate(filepath)
+    for filepath, content in contents.items():
+        filepath = os.path.normpath(filepath)
+        data = content if isinstance(content, bytes) else content.encode('utf-8')
+        entry = index.record_write(filepath, data)
+        if entry is None:
+            content_cache.invalidate(filepath)
+        else:
+            content_cache.store(workspace.id, None, filepath, data, entry.hash, entry.mtime_ns / 1e9)
+
+def record_workspace_version(workspace: Workspace, source: str, restored_from: int = None):
+    """Record the workspace's current files in the version store; returns the new version number or None.
+
+    A failure is logged rather than raised: the write it follows has already been committed.
+    """
+    try:
+        index = file_indexes.get(workspace)
+        index.scan()  # Re-hashes only files whose size or mtime changed
+        entries = {name: (entry.path, entry.hash) for name, entry in index.entries().items()}
+        with workspace_write_lock(workspace.root):
+            manifest = version_store.record(workspace.id, entries, source, restored_from)
+    except Exception as e:
+        logger.error(f"Error recording a version of workspace {workspace.id}: {str(e)}")
+        return None
+    return manifest["version"] if manifest is not None else None
+
+async def commit_workspace_files(workspace: Workspace, contents: dict, source: str = None, remove=(),
+                                 extend_snapshot: bool = False):
+    """Check the quota, write ``{filepath: content}`` as one transaction and update the index and cache.
+
+    With a ``source`` the result is recorded as a new version, whose number is returned.
+    ``extend_snapshot`` keeps the rollback snapshot of the previous write and adds to it.
+    """
+    sizes = {
+        filepath: len(content if isinstance(content, bytes) else content.encode('utf-8'))
+        for filepath, content in contents.items()
+    }
+    sizes.update({filepath: 0 for filepath in remove})
+    reserved = await run_file_io(workspace_manager.reserve, workspace, sizes)
+    try:
+        await run_file_io(
+            write_files_atomic, workspace.root, contents, WORKSPACE_FSYNC, True, remove, extend_snapshot
+        )
+    finally:
+        workspace_manager.release(workspace, reserved)
+    await run_file_io(record_workspace_writes, workspace, contents, remove)
+    if source is not None:
+        return await run_file_io(record_workspace_version, workspace, source)
+    return None
+
+def load_preview_content(workspace: Workspace, name: str, entry):
+    """Read a small file into the preview cache, refreshing its index entry from the bytes read."""
+    with open(entry.path, 'rb') as f:
+        data = f.read()
+    entry = file_indexes.get(workspace).record_write(entry.path, data) or entry
+    return content_cache.store(workspace.id, name, entry.path, data, entry.hash, entry.mtime_ns / 1e9)
+
+def cached_content_response(request: Request, content) -> Response:
+    """Serve a cached file with validators, conditional requests, Range and precompressed variants."""
+    size = len(content.data)
+    range_header = request.headers.get("range")
+    # Ranges always address the identity encoding
+    encoding = None if range_header else choose_encoding(request.headers.get("accept-encoding"), content.variants)
+    etag = make_etag(content.hash)
+    if encoding:
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(content.mtime),
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None and not_modified_since(request.headers.get("if-modified-since"), content.mtime)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(content.data[start:end + 1], status_code=206, media_type=content.media_type, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(content.variants[encoding], media_type=content.media_type, headers=headers)
+    return Response(content.data, media_type=content.media_type, headers=headers)
+
+def evict_workspaces() -> list:
+    """Delete idle workspaces and everything kept about them; blocking, so run it on the file I/O pool."""
+    evicted = workspace_manager.evict_idle()
+    for workspace_id in evicted:
+        file_indexes.forget(workspace_id)
+        content_cache.forget_workspace(workspace_id, os.path.join(WORKSPACES_DIR, workspace_id))
+        version_store.forget_workspace(workspace_id)
+        forget_workspace_lock(os.path.join(WORKSPACES_DIR, workspace_id))
+    return evicted
+
+async def evict_idle_workspaces():
+    while True:
+        await asyncio.sleep(WORKSPACE_EVICTION_INTERVAL)
+        try:
+            # Stats, rmtree and the manager lock (held by reserve() while it walks a tree) stay off the loop
+            evicted = await run_file_io(evict_workspaces)
+            if evicted:
+                logger.info(f"Evicted {len(evicted)} idle workspaces")
+        except Exception as e:
+            logger.error(f"Error evicting workspaces: {str(e)}")
+        try:
+            # Blobs of evicted workspaces and pruned versions
+            await run_file_io(version_store.gc)
+        except Exception as e:
+            logger.error(f"Error collecting version store blobs: {str(e)}")
+
+@traced("parse_fenced_code_blocks")
 def parse_fenced_code_blocks(text: str) -> dict:
     try:
-        logger.info(f"Raw response from Groq: {text[:500]}...")
-        pattern = r"```([\w.\-/+]+)\n([\s\S]+?)```"
-        matches = re.findall(pattern, text)
+        if LOG_RAW_LLM_RESPONSES:
+            logger.info(f"Raw LLM response: {text[:500]}...")
+        files = parse_code_blocks(text)
         
-        if not matches:
+        if not files:
             logger.error("No code blocks found in response")
             return {}
             
-        files = {}
-        for filename, code in matches:
-            filename = filename.strip()
-            code = code.strip()
-            if filename and code:  # Only add if both filename and code are non-empty
-                files[filename] = code
-                logger.info(f"Parsed file: {filename}")
-        
+        logger.info(f"Parsed files: {', '.join(files)}")
         return files
     except Exception as e:
         logger.error(f"Error parsing code blocks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error parsing code blocks: {str(e)}")
 
+@traced("get_missing_files")
 def get_missing_files(files: dict) -> list:
-    required_files = {
-        'public/index.html',
-        'src/App.js',
-        'src/index.js',
-        'src/App.css',
-        'src/index.css',
-        'src/server.js'
-    }
+    required_files = set(REQUIRED_FILES)
     
     # Get the set of files present, normalizing paths
     files_present = set()
@@ -105,175 +416,455 @@ def get_missing_files(files: dict) -> list:
     
     # If no backend file is present, add it to missing
     has_backend = any(f.endswith(('server.js', 'main.py')) for f in files_present)
-    if not has_backend:
+    if not has_backend and 'src/server.js' not in missing:
         missing.append('src/server.js')
     
     return missing
 
-async def call_llm_with_prompt(user_prompt: str, system_prompt: str):
-    try:
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "temperature": 0.7,
-            "max_tokens": 4000,  # Increased token limit
+def is_complete_generation(content: str) -> bool:
+    files = parse_fenced_code_blocks(content)
+    return bool(files) and not get_missing_files(files)
+
+def get_http_client() -> httpx.AsyncClient:
+    client = getattr(app.state, "http_client", None)
+    if client is None:
+        # Lifespan did not run (e.g. app used without a server); create the pool lazily
+        client = create_http_client()
+        app.state.http_client = client
+    return client
+
+def plan_token_budget(user_prompt: str, system_prompt: PromptTemplate, expected_output_tokens: int) -> dict:
+    """Size ``max_tokens`` for one call; the system prompt's token count was taken when it was compiled."""
+    # A few tokens per message go to role markers in the chat format
+    input_tokens = system_prompt.tokens + count_tokens(user_prompt) + 8
+    budget = token_budget.plan(input_tokens, expected_output_tokens)
+    if budget["max_tokens"] <= 0:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Prompt of ~{input_tokens} tokens does not fit the model's {budget['context_window']}-token context",
+        )
+    if budget["limited_by_context"]:
+        logger.warning(f"Completion budget limited to {budget['max_tokens']} tokens by the context window")
+    return budget
+
+def generation_output_tokens(filenames) -> int:
+    return token_budget.expected_file_tokens(filenames, text_tokens=GENERATION_TEXT_TOKENS)
+
+def build_llm_payload(user_prompt: str, system_prompt: str, max_tokens: int, model: str, stream: bool = False) -> dict:
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def get_llm_router():
+    router = getattr(app.state, "llm_router", None)
+    if router is None:
+        router = create_llm_router()
+        app.state.llm_router = router
+    return router
+
+def get_llm_scheduler():
+    scheduler = getattr(app.state, "llm_scheduler", None)
+    if scheduler is None:
+        scheduler = create_llm_scheduler()
+        app.state.llm_scheduler = scheduler
+    return scheduler
+
+def estimate_request_tokens(budget: dict) -> int:
+    # What the call can count against the provider's token quota
+    return budget["input_tokens"] + budget["max_tokens"]
+
+def record_truncation(finish_reason: str, budget: dict):
+    if finish_reason == "length":
+        LLM_TRUNCATIONS.inc(endpoint=current_endpoint.get())
+        logger.warning(f"Completion truncated at max_tokens={budget['max_tokens']}")
+
+def rate_limited_error(e: httpx.HTTPStatusError) -> HTTPException:
+    retry_after = e.response.headers.get("retry-after")
+    return HTTPException(
+        status_code=429,
+        detail="LLM provider rate limit reached, please retry later",
+        headers={"Retry-After": retry_after} if retry_after else None,
+    )
+
+def get_llm_cache():
+    return getattr(app.state, "llm_cache", None)
+
+def get_cache_key(payload: dict, fold_prompt: bool = False) -> str:
+    messages = {message["role"]: message["content"] for message in payload["messages"]}
+    return make_cache_key(
+        payload["model"], messages["system"], messages["user"], payload["temperature"], payload["max_tokens"],
+        fold_prompt,
+    )
+
+async def request_completion(user_prompt: str, system_prompt: PromptTemplate, expected_output_tokens: int,
+                             use_cache: bool = True, cache_if=None, priority: int = PRIORITY_BULK,
+                             route: str = "generate", fold_prompt: bool = False) -> dict:
+    """Run one completion on ``route``'s model and return its text with token usage, budget and latency.
+
+    ``max_tokens`` is sized from ``expected_output_tokens`` and the context left
+    after the prompt. Identical requests are served from the response cache, and
+    identical in-flight requests share one upstream call. ``cache_if`` lets
+    callers keep unusable completions (e.g. missing files) out of the cache.
+    ``fold_prompt`` lets prompts differing only in case and whitespace share a
+    cache entry; only pass it for free-text prompts that embed no code.
+    """
+    started = time.perf_counter()
+
+    def result(content: str, usage: dict, cached: bool, finish_reason: str = None, model: str = None) -> dict:
+        elapsed = time.perf_counter() - started
+        endpoint = current_endpoint.get()
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        LLM_REQUEST_DURATION.observe(elapsed, endpoint=endpoint, cached=str(cached).lower())
+        SPAN_DURATION.observe(elapsed, span="call_llm_with_prompt", endpoint=endpoint)
+        LLM_TOKENS.inc(prompt_tokens, endpoint=endpoint, direction="in")
+        LLM_TOKENS.inc(completion_tokens, endpoint=endpoint, direction="out")
+        return {
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(elapsed * 1000, 1),
+            "cached": cached,
+            "finish_reason": finish_reason,
+            "model": model,
+            "budget": budget,
         }
 
-        logger.info(f"Calling Groq API with model: {GROQ_MODEL}")
-        async with httpx.AsyncClient(timeout=120) as client:  # Increased timeout
-            res = await client.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-            )
-            res.raise_for_status()
-            response_data = res.json()
-            if "choices" not in response_data or not response_data["choices"]:
-                raise HTTPException(status_code=500, detail="Invalid response from Groq API")
-            return response_data["choices"][0]["message"]["content"]
+    budget = plan_token_budget(user_prompt, system_prompt, expected_output_tokens)
+    llm_route = get_llm_router().route(route)
+    try:
+        # The cache key names the primary model even when a hedged alternate answers
+        payload = build_llm_payload(user_prompt, system_prompt.text, budget["max_tokens"], llm_route.primary.model)
+        cache = get_llm_cache()
+        cache_key = None
+        if cache is not None:
+            if use_cache:
+                cache_key = get_cache_key(payload, fold_prompt)
+                # A memory miss falls through to the SQLite tier, so keep the lookup off the event loop
+                cached = await run_file_io(cache.get, cache_key)
+                if cached is not None:
+                    logger.info("Serving LLM response from cache")
+                    return result(cached, {}, True)
+            else:
+                cache.record_bypass()
+
+        async def post(target) -> dict:
+            logger.info(f"Calling LLM {target.label}")
+            client = get_http_client()
+            client.pool_counters.request_started()
+            failed = True
+            try:
+                res = await client.post(
+                    target.provider.url, json=dict(payload, model=target.model), headers=target.provider.headers()
+                )
+                res.raise_for_status()
+                failed = False
+            finally:
+                client.pool_counters.request_finished(failed)
+            return res.json()
+
+        async def send() -> dict:
+            # A hedged alternate shares the scheduler slot (and any retry) of the primary
+            target, response_data = await get_llm_router().run(llm_route, post)
+            return dict(response_data, served_by=target.label)
+
+        response_data = await get_llm_scheduler().submit(
+            send,
+            priority=priority,
+            tokens=estimate_request_tokens(budget),
+            key=get_cache_key(payload, fold_prompt) if use_cache else None,
+        )
+        if "choices" not in response_data or not response_data["choices"]:
+            raise HTTPException(status_code=500, detail="Invalid response from LLM provider")
+        content = response_data["choices"][0]["message"]["content"]
+        finish_reason = response_data["choices"][0].get("finish_reason")
+        record_truncation(finish_reason, budget)
+        if cache_key is not None and content and (cache_if is None or cache_if(content)):
+            await run_file_io(cache.set, cache_key, content)
+        return result(content, response_data.get("usage") or {}, False, finish_reason, response_data["served_by"])
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            logger.error("LLM provider rate limit persisted after retries")
+            raise rate_limited_error(e)
+        logger.error(f"HTTP error calling LLM provider: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
     except httpx.HTTPError as e:
-        logger.error(f"HTTP error calling Groq API: {str(e)}")
+        logger.error(f"HTTP error calling LLM provider: {str(e)}")
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error calling Groq API: {str(e)}")
+        logger.error(f"Unexpected error calling LLM provider: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@app.post("/generate")
-async def generate_code(req: PromptRequest):
-    logger.info(f"Received generation request with prompt: {req.prompt[:100]}...")
-    
-    system_prompt = (
-        "You are an expert fullstack developer. Generate an application according to user preference "
-        "based on the user's idea. Your response must be in two parts:\n\n"
-        "PART 1 - TEXT RESPONSE:\n"
-        "First, provide a text response that includes:\n"
-        "1. A brief summary of the user's idea\n"
-        "2. A friendly message about the generated application\n"
-        "3. Suggestions for customization\n"
-        "Format this as a single text block without any code blocks.\n\n"
-        
-        "PART 2 - CODE FILES:\n"
-        "Then, provide all the required code files in markdown blocks. Required files (with exact paths):\n"
-        "1. public/index.html\n"
-        "2. src/App.js\n"
-        "3. src/index.js\n"
-        "4. src/App.css\n"
-        "5. src/index.css\n"
-        "6. src/server.js\n"
-        
-        "Format each file like this:\n"
-        "```public/index.html\ncode content\n```\n"
-        "```src/App.js\ncode content\n```\n\n"
-        
-        "Important:\n"
-        "- Each file must be in its own code block\n"
-        "- Use EXACT filenames with paths as shown above\n"
-        "- Include ALL required files\n"
-        "- Make sure the code is complete and runnable\n"
-        "- The paths must match exactly: public/index.html, src/App.js, etc.\n"
-        "- If you miss any required files, the generation will fail\n"
-        "- Double-check that you've included all required files before responding\n\n"
-        
-        "Data Handling:\n"
-        "- For applications that would normally require external APIs, use simulated data instead:\n"
-        "  1. Weather App: Use a weatherData array with 5-7 days of simulated weather data\n"
-        "  2. Maps App: Use a locations array with 5-7 predefined locations\n"
-        "  3. E-commerce: Use a products array with 5-7 sample products\n"
-        "  4. Social Media: Use a posts array with 5-7 sample posts\n"
-        "  5. News App: Use a newsData array with 5-7 sample news articles\n"
-        "- Include a comment in the code indicating this is simulated data\n"
-        "- Add a note in the UI that this is using simulated data\n"
-        "- Make the simulated data realistic and varied\n"
-        "- Include all necessary fields that would be present in real API responses\n"
-        "- Structure the data to match typical API response formats\n"
-        "- Add comments explaining how to replace with real API data\n\n"
-        
-       "Styling Requirements:\n"
-"- Add modern, responsive styles in src/index.css\n"
-"- Use CSS variables for consistent theming\n"
-"- Include styles for common elements (buttons, inputs, containers)\n"
-"- Add responsive design with media queries\n"
-"- Use flexbox or grid for layouts\n"
-"- Include hover and focus states for interactive elements\n"
-"- Add smooth transitions and animations using only advanced CSS (e.g., transform, opacity, scale, keyframes)\n"
-"- Use CSS keyframe animations and transition properties for interactive effects (e.g., fade-in, slide-up, scale on hover)\n"
-"- Ensure styles are scoped to prevent conflicts\n"
-        "- Use CSS modules or styled-components for scoped styles\n"
-        "- Ensure styles are modular and reusable\n"
-"- Make sure App.js imports and uses the styles correctly\n\n"
+async def call_llm_with_prompt(user_prompt: str, system_prompt: PromptTemplate, expected_output_tokens: int,
+                              use_cache: bool = True, cache_if=None, priority: int = PRIORITY_BULK,
+                              route: str = "generate") -> str:
+    completion = await request_completion(
+        user_prompt, system_prompt, expected_output_tokens, use_cache=use_cache, cache_if=cache_if, priority=priority,
+        route=route,
+    )
+    return completion["content"]
 
+async def stream_llm_with_prompt(user_prompt: str, system_prompt: PromptTemplate, expected_output_tokens: int,
+                                 use_cache: bool = True, cache_if=None, route: str = "generate",
+                                 fold_prompt: bool = False):
+    """Yield content deltas from the provider's streaming (SSE) completion API.
 
+    A cached completion is replayed as a single delta; a fresh one is cached once fully received.
+    Streams always use the route's primary target (deltas already sent cannot be hedged).
+    """
+    budget = plan_token_budget(user_prompt, system_prompt, expected_output_tokens)
+    target = get_llm_router().route(route).primary
+    payload = build_llm_payload(user_prompt, system_prompt.text, budget["max_tokens"], target.model, stream=True)
+    cache = get_llm_cache()
+    cache_key = None
+    if cache is not None:
+        if use_cache:
+            cache_key = get_cache_key(payload, fold_prompt)
+            cached = await run_file_io(cache.get, cache_key)
+            if cached is not None:
+                logger.info("Replaying LLM response from cache")
+                yield cached
+                return
+        else:
+            cache.record_bypass()
 
-        
-        "Text Response Template:\n"
-        "Use this format for the text response (PART 1):\n"
-        "'I understand you want to create [brief description of the app]. I've generated a [type of app] application that includes [key features].\n\n"
-        "The application is now ready for you to explore! Feel free to make any adjustments to better match your vision. You can:\n"
-        "- Modify the simulated data to test different scenarios\n"
-        "- Customize the UI styling to match your preferences\n"
-        "- Add new features or modify existing ones\n"
-        "- Adjust the layout or functionality as needed\n\n"
-        "Let me know if you'd like to make any specific changes or have questions about the implementation!'"
-    )
+    received = []
+    logger.info(f"Streaming from LLM {target.label}")
+    client = get_http_client()
+    failed = True
+    async with get_llm_scheduler().slot(PRIORITY_BULK, estimate_request_tokens(budget)):
+        client.pool_counters.request_started()
+        try:
+            async with client.stream("POST", target.provider.url, json=payload, headers=target.provider.headers()) as res:
+                res.raise_for_status()
+                async for line in res.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data).get("choices") or []
+                    except ValueError:
+                        logger.warning(f"Skipping malformed stream event: {data[:100]}")
+                        continue
+                    if choices:
+                        record_truncation(choices[0].get("finish_reason"), budget)
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            received.append(delta)
+                            yield delta
+            failed = False
+        finally:
+            client.pool_counters.request_finished(failed)
+
+    content = "".join(received)
+    if cache_key is not None and content and (cache_if is None or cache_if(content)):
+        await run_file_io(cache.set, cache_key, content)
+
+def locate_generated_file(workspace: Workspace, filename: str):
+    # Save to appropriate directory based on file type; unprefixed files belong in src/
+    if not filename.startswith(('public/', 'src/')):
+        filename = f"src/{filename}"
+    return workspace.split_path(filename, for_write=True)
+
+@traced("save_files")
+async def save_generated_files(workspace: Workspace, files: dict, source: str = "generate",
+                               extend_snapshot: bool = False):
+    """Check the workspace quota for the whole file set, then commit it in one transaction.
+
+    Returns the recorded version number; pass ``source=None`` to skip recording one.
+    """
+    contents = {}
+    for filename, code in files.items():
+        directory, relative = locate_generated_file(workspace, filename)
+        contents[os.path.join(directory, normalize_filename(relative))] = code
+    try:
+        return await commit_workspace_files(workspace, contents, source, extend_snapshot=extend_snapshot)
+    except WorkspaceQuotaError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error saving files {', '.join(files)}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error saving files: {str(e)}")
+
+def build_completion_prompt(idea: str, files: dict, missing: list) -> str:
+    context = "\n".join(f"```{filename}\n{code}\n```" for filename, code in files.items())
+    return COMPLETION_PROMPT.render(idea=idea, context=context, missing=", ".join(missing))
+
+def covers_files(required: list):
+    """Cache predicate accepting only completions that contain every requested file."""
+    def predicate(content: str) -> bool:
+        return not set(required) - set(parse_fenced_code_blocks(content))
+    return predicate
+
+def record_generation_attempt(attempt: int, mode: str, outcome: str, duration: float):
+    endpoint = current_endpoint.get()
+    SPAN_DURATION.observe(duration, span="generate_attempt", endpoint=endpoint)
+    GENERATION_ATTEMPTS.inc(endpoint=endpoint, mode=mode, outcome=outcome)
+    if attempt > 0:
+        GENERATION_RETRIES.inc(endpoint=endpoint)
+
+def summarize_attempts(attempts: list) -> dict:
+    return {
+        "attempts": len(attempts),
+        "prompt_tokens": sum(a["prompt_tokens"] for a in attempts),
+        "completion_tokens": sum(a["completion_tokens"] for a in attempts),
+        "max_tokens": sum(a["max_tokens"] for a in attempts),
+        "truncated": sum(a["finish_reason"] == "length" for a in attempts),
+        "latency_ms": round(sum(a["latency_ms"] for a in attempts), 1),
+    }
+
+def collect_llm_cache_stats() -> dict:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
+
+def collect_archive_cache_stats() -> dict:
+    archive_cache = getattr(app.state, "archive_cache", None)
+    return archive_cache.stats() if archive_cache is not None else {}
+
+def collect_job_stats() -> dict:
+    job_queue = getattr(app.state, "job_queue", None)
+    return job_queue.stats() if job_queue is not None else {}
+
+# Component stats are exported as gauges on /metrics at scrape time
+registry.register_collector("llm_http_pool", lambda: get_pool_stats(get_http_client()))
+registry.register_collector("llm_cache", collect_llm_cache_stats)
+registry.register_collector("llm_scheduler", lambda: get_llm_scheduler().stats())
+for route_name in ROUTE_NAMES:
+    registry.register_collector(f"llm_route_{route_name}", lambda name=route_name: get_llm_router().stats()[name])
+registry.register_collector("workspaces", lambda: workspace_manager.stats())
+registry.register_collector("archive_cache", collect_archive_cache_stats)
+registry.register_collector("file_index", lambda: file_indexes.stats())
+registry.register_collector("preview_cache", lambda: content_cache.stats())
+registry.register_collector("jobs", collect_job_stats)
+registry.register_collector("version_store", lambda: version_store.stats())
+
+@api.post("/generate")
+async def generate_code(req: PromptRequest, workspace: Workspace = Depends(get_or_create_workspace)):
+    logger.info(f"Received generation request with prompt: {req.prompt[:100]}...")
+    return await run_generation(req, workspace)
+
+async def run_generation(req: PromptRequest, workspace: Workspace, progress=None) -> dict:
+    """Generate, complete and save an app into ``workspace``; raises HTTPException on failure.
 
+    ``progress`` is an optional ``async (event)`` callback told about each attempt.
+    """
     user_prompt = req.prompt
     max_retries = 2  # Increased retries
     missing_files = []
+    code_files = {}
+    attempts = []
 
     for attempt in range(max_retries + 1):
+        attempt_started = time.perf_counter()
+        mode = "full"
+        outcome = "error"
         try:
             logger.info(f"Attempt {attempt + 1} of {max_retries + 1}")
-            content = await call_llm_with_prompt(user_prompt, system_prompt)
-            code_files = parse_fenced_code_blocks(content)
-            
-            if not code_files:
+            if progress is not None:
+                await progress({"type": "attempt_started", "attempt": attempt + 1})
+            if code_files and missing_files and req.retry_mode == "complete":
+                # Merge-and-complete: only ask for the gaps, with the files we have as context
+                mode = "complete"
+                requested = list(missing_files)
+                completion = await request_completion(
+                    build_completion_prompt(req.prompt, code_files, requested),
+                    COMPLETION_SYSTEM_PROMPT,
+                    generation_output_tokens(requested),
+                    use_cache=not req.bypass_cache,
+                    cache_if=covers_files(requested),
+                )
+            else:
+                mode = "full"
+                requested = []
+                completion = await request_completion(
+                    user_prompt,
+                    GENERATION_SYSTEM_PROMPT,
+                    generation_output_tokens(REQUIRED_FILES),
+                    use_cache=not req.bypass_cache,
+                    cache_if=is_complete_generation,
+                    # The idea (plus a fixed retry note) is free text
+                    fold_prompt=True,
+                )
+            new_files = parse_fenced_code_blocks(completion["content"])
+            attempts.append({
+                "attempt": attempt + 1,
+                "mode": mode,
+                "requested_files": requested,
+                "received_files": list(new_files),
+                "prompt_tokens": completion["prompt_tokens"],
+                "completion_tokens": completion["completion_tokens"],
+                "estimated_prompt_tokens": completion["budget"]["input_tokens"],
+                "max_tokens": completion["budget"]["max_tokens"],
+                "finish_reason": completion["finish_reason"],
+                "model": completion["model"],
+                "latency_ms": completion["latency_ms"],
+                "cached": completion["cached"],
+            })
+            logger.info(
+                f"Attempt {attempt + 1} ({mode}): {len(new_files)} files, "
+                f"{completion['completion_tokens']} completion tokens, {completion['latency_ms']} ms"
+            )
+            if progress is not None:
+                await progress(dict(attempts[-1], type="attempt_finished"))
+
+            if not new_files:
                 logger.error("No code files parsed from response")
                 raise HTTPException(status_code=500, detail="No code files found in the response")
+
+            if mode == "complete":
+                # Keep what we already have; only fill in files we did not get before
+                for filename, code in new_files.items():
+                    code_files.setdefault(filename, code)
+            else:
+                code_files = new_files
                 
             missing = get_missing_files(code_files)
             logger.info(f"Missing files: {missing}")
 
             if not missing:
-                files_content = {}
-                for filename, code in code_files.items():
-                    try:
-                        # Save to appropriate directory based on file type
-                        if filename.startswith('public/'):
-                            actual_filename = filename.replace('public/', '')
-                            save_file(PUBLIC_DIR, actual_filename, code)
-                        else:
-                            actual_filename = filename.replace('src/', '')
-                            save_file(PROJECT_DIR, actual_filename, code)
-                        
-                        # Store the file content for the response
-                        files_content[filename] = code
-                    except Exception as e:
-                        logger.error(f"Error saving file {filename}: {str(e)}")
-                        raise HTTPException(status_code=500, detail=f"Error saving file {filename}: {str(e)}")
-                
+                version = await save_generated_files(workspace, code_files)
+                outcome = "success"
+                if progress is not None:
+                    await progress({"type": "files_saved", "files": list(code_files), "version": version})
                 return {
                     "message": "Files generated",
-                    "files": files_content,
-                    "text_response": "Files generated successfully!"
+                    "workspace": workspace.id,
+                    "version": version,
+                    "files": code_files,
+                    "text_response": "Files generated successfully!",
+                    "attempts": attempts,
+                    "usage": summarize_attempts(attempts),
                 }
 
             # Store missing files for the error message
             missing_files = missing
+            outcome = "missing_files"
 
-            # Retry by updating the user prompt with more specific instructions
-            user_prompt += (
-                f"\n\nIMPORTANT: Your last response was missing these required files: {', '.join(missing)}. "
-                f"Please regenerate and include ALL of these files. Each file must be in its own code block with the EXACT filename and path. "
-                f"For example:\n"
-                f"```src/index.css\n/* Your CSS code here */\n```\n"
-                f"Make sure to include ALL missing files in your response."
-            )
+            if req.retry_mode == "full":
+                # Retry with instructions about the current gaps only, so the prompt does not grow per attempt
+                user_prompt = req.prompt + RETRY_NOTE.render(missing=", ".join(missing))
+        except HTTPException as e:
+            # Quota and upstream rate-limit errors will not go away by retrying immediately
+            if e.status_code in (413, 429):
+                raise
+            logger.error(f"Error in generation attempt {attempt + 1}: {e.detail}")
+            if attempt == max_retries:
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Generation failed after {max_retries + 1} attempts. Missing files: {', '.join(missing_files)}"
+                )
         except Exception as e:
             logger.error(f"Error in generation attempt {attempt + 1}: {str(e)}")
             if attempt == max_retries:
@@ -281,137 +872,554 @@ async def generate_code(req: PromptRequest):
                     status_code=500, 
                     detail=f"Generation failed after {max_retries + 1} attempts. Missing files: {', '.join(missing_files)}"
                 )
+        finally:
+            record_generation_attempt(attempt, mode, outcome, time.perf_counter() - attempt_started)
 
     raise HTTPException(
         status_code=500, 
         detail=f"Failed to generate all required files after {max_retries + 1} attempts. Missing files: {', '.join(missing_files)}"
     )
 
-@app.get("/files")
-def get_file_list():
+async def run_generation_job(payload: dict, progress) -> dict:
+    workspace = await run_file_io(workspace_manager.resolve, payload["workspace"])
+    req = PromptRequest(**{key: value for key, value in payload.items() if key != "workspace"})
+    return await run_generation(req, workspace, progress)
+
+def get_job_queue():
+    job_queue = getattr(app.state, "job_queue", None)
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is not running")
+    return job_queue
+
+@api.post("/generate/jobs", status_code=202)
+async def submit_generation_job(req: PromptRequest, workspace: Workspace = Depends(get_or_create_workspace)):
+    """Queue a generation and return immediately; poll ``/jobs/{job_id}`` for progress and the result."""
+    logger.info(f"Queued generation job with prompt: {req.prompt[:100]}...")
+    job_id = await get_job_queue().submit("generate", dict(req.model_dump(), workspace=workspace.id))
+    return {"job_id": job_id, "status": "queued", "workspace": workspace.id, "status_url": f"/jobs/{job_id}"}
+
+@api.get("/jobs/{job_id}")
+async def get_job(job_id: str, after: int = Query(0, description="Only return events after this sequence number")):
+    job = await run_file_io(get_job_queue().store.get, job_id, after)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api.post("/generate/batch")
+async def generate_batch(req: BatchGenerateRequest):
+    """Generate many apps with bounded parallelism, streaming one NDJSON result per item as it finishes."""
+    if not req.prompts:
+        raise HTTPException(status_code=400, detail="No prompts given")
+    if len(req.prompts) > GENERATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {GENERATE_BATCH_MAX_ITEMS} prompts per batch")
+    prefix = req.workspace_prefix or f"batch-{secrets.token_hex(4)}"
+    if not WORKSPACE_ID_PATTERN.match(f"{prefix}-{len(req.prompts) - 1}"):
+        raise HTTPException(status_code=400, detail=f"Invalid workspace prefix: {prefix}")
+    concurrency = max(1, min(req.concurrency or GENERATE_BATCH_CONCURRENCY, GENERATE_BATCH_MAX_CONCURRENCY))
+    logger.info(f"Received batch of {len(req.prompts)} prompts (concurrency {concurrency}, prefix {prefix})")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, prompt: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            workspace_id = f"{prefix}-{index}"
+            result = {"type": "result", "index": index, "workspace": workspace_id}
+            try:
+                workspace = await run_file_io(workspace_manager.resolve, workspace_id)
+                item = PromptRequest(prompt=prompt, bypass_cache=req.bypass_cache, retry_mode=req.retry_mode)
+                generated = await run_generation(item, workspace)
+                result.update(
+                    status="ok",
+                    files=list(generated["files"]),
+                    attempts=len(generated["attempts"]),
+                    usage=generated["usage"],
+                )
+            except Exception as e:
+                # One failed item must not sink the batch
+                result.update(status="error", error=e.detail if isinstance(e, HTTPException) else str(e))
+                if isinstance(e, HTTPException):
+                    result["status_code"] = e.status_code
+                logger.error(f"Batch item {index} failed: {result['error']}")
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return result
+
+    async def event_stream():
+        started = time.perf_counter()
+        succeeded = 0
+        yield json.dumps({"type": "start", "workspace_prefix": prefix, "items": len(req.prompts), "concurrency": concurrency}) + "\n"
+        tasks = [asyncio.ensure_future(run_item(index, prompt)) for index, prompt in enumerate(req.prompts)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                succeeded += result["status"] == "ok"
+                yield json.dumps(result) + "\n"
+        finally:
+            # The client went away: stop items that have not finished
+            for task in tasks:
+                task.cancel()
+        elapsed = time.perf_counter() - started
+        yield json.dumps({
+            "type": "done",
+            "succeeded": succeeded,
+            "failed": len(req.prompts) - succeeded,
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "apps_per_minute": round(succeeded * 60 / elapsed, 2) if elapsed else 0.0,
+        }) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@api.post("/generate/stream")
+async def generate_code_stream(req: PromptRequest, workspace: Workspace = Depends(get_or_create_workspace)):
+    """Stream generation progress as NDJSON, saving each file as soon as its block closes."""
+    logger.info(f"Received streaming generation request with prompt: {req.prompt[:100]}...")
+
+    async def event_stream():
+        parser = IncrementalCodeBlockParser()
+        files_content = {}
+
+        def emit(event: dict) -> str:
+            return json.dumps(event) + "\n"
+
+        async def file_events(blocks: list):
+            events = []
+            if blocks:
+                # One version for the whole stream is recorded when it ends, and one snapshot
+                # (taken by the first block) lets /rollback undo every file the stream wrote
+                await save_generated_files(workspace, dict(blocks), source=None, extend_snapshot=bool(files_content))
+            for filename, code in blocks:
+                files_content[filename] = code
+                events.append(emit({"type": "file", "filename": filename, "content": code}))
+            return events
+
+        yield emit({"type": "start", "workspace": workspace.id})
+        try:
+            async for delta in stream_llm_with_prompt(
+                req.prompt,
+                GENERATION_SYSTEM_PROMPT,
+                generation_output_tokens(REQUIRED_FILES),
+                use_cache=not req.bypass_cache,
+                cache_if=is_complete_generation,
+                fold_prompt=True,
+            ):
+                yield emit({"type": "token", "content": delta})
+                for event in await file_events(parser.feed(delta)):
+                    yield event
+            for event in await file_events(parser.close()):
+                yield event
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Streaming generation failed: {detail}")
+            if files_content:
+                await run_file_io(record_workspace_version, workspace, "generate_stream")
+            yield emit({"type": "error", "message": f"Generation failed: {detail}", "files": list(files_content)})
+            return
+
+        if not files_content:
+            logger.error("No code files parsed from streamed response")
+            yield emit({"type": "error", "message": "No code files found in the response", "files": []})
+            return
+
+        missing = get_missing_files(files_content)
+        logger.info(f"Missing files: {missing}")
+        yield emit({
+            "type": "done",
+            "message": "Files generated" if not missing else "Files generated with missing files",
+            "files": list(files_content),
+            "missing_files": missing,
+            "version": await run_file_io(record_workspace_version, workspace, "generate_stream"),
+        })
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@api.get("/healthz")
+def healthz():
+    """Liveness: the process is up and its event loop answers."""
+    return {"status": "ok"}
+
+@api.get("/readyz")
+async def readyz():
+    """Readiness: startup has finished and the shared stores are reachable; 503 otherwise."""
+    checks = {"startup": getattr(app.state, "ready", False)}
+    if checks["startup"]:
+        checks["projects_dir"] = await run_file_io(os.access, WORKSPACES_DIR, os.W_OK)
+        try:
+            checks["job_store"] = await run_file_io(app.state.job_queue.store.ping)
+        except Exception as e:
+            logger.error(f"Readiness check of the job store failed: {str(e)}")
+            checks["job_store"] = False
+    ready = all(checks.values())
+    body = {"ready": ready, "pid": os.getpid(), "checks": checks}
+    if ready:
+        body["startup_ms"] = round(app.state.startup_seconds * 1000, 1)
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@api.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@api.get("/stats/http-pool")
+def http_pool_stats():
+    return get_pool_stats(get_http_client())
+
+@api.get("/stats/llm-cache")
+def llm_cache_stats():
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return dict(cache.stats(), enabled=True)
+
+@api.get("/stats/llm-scheduler")
+def llm_scheduler_stats():
+    return get_llm_scheduler().stats()
+
+@api.get("/stats/llm-routes")
+def llm_route_stats():
+    return get_llm_router().stats()
+
+@api.get("/stats/workspaces")
+def workspace_stats():
+    return workspace_manager.stats()
+
+@api.get("/stats/file-index")
+def file_index_stats():
+    return file_indexes.stats()
+
+@api.get("/stats/jobs")
+def job_stats():
+    return get_job_queue().stats()
+
+@api.get("/stats/versions")
+def version_store_stats():
+    return version_store.stats()
+
+@api.get("/files")
+async def get_file_list(
+    since: str = Query(None, description="Only list changes after this version token"),
+    workspace: Workspace = Depends(get_workspace),
+):
     try:
-        return {"files": list_files(PROJECT_DIR)}
+        index = await run_file_io(file_indexes.get, workspace, True)
+        if since is None:
+            version, files = index.files()
+            return {"files": files, "version": version}
+        version, changed, deleted, reset = index.changes_since(since)
+        return {
+            "version": version,
+            "reset": reset,
+            "changed": [
+                {"name": entry.name[len("src/"):], "size": entry.size, "etag": make_etag(entry.hash)}
+                for entry in changed
+            ],
+            "deleted": deleted,
+        }
     except Exception as e:
         logger.error(f"Error listing files: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
 
-@app.get("/file")
-def read_file(name: str):
+@api.get("/file")
+async def read_file(
+    name: str,
+    response: Response,
+    workspace: Workspace = Depends(get_workspace),
+    if_none_match: str = Header(None),
+):
     try:
-        # Handle paths correctly
-        if name.startswith('public/'):
-            filepath = os.path.join(PUBLIC_DIR, name.replace('public/', ''))
-        elif name.startswith('src/'):
-            filepath = os.path.join(PROJECT_DIR, name.replace('src/', ''))
-        else:
-            # If no prefix, try both directories
-            public_path = os.path.join(PUBLIC_DIR, name)
-            src_path = os.path.join(PROJECT_DIR, name)
-            
-            if os.path.exists(public_path):
-                filepath = public_path
-            elif os.path.exists(src_path):
-                filepath = src_path
-            else:
-                raise HTTPException(status_code=404, detail=f"File {name} not found")
-            
-        logger.info(f"Reading file from path: {filepath}")
-        
-        if not os.path.exists(filepath):
+        entry = await run_file_io(lookup_workspace_file, workspace, name)
+        if entry is None:
             raise HTTPException(status_code=404, detail=f"File {name} not found")
-            
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return {"filename": name, "content": f.read()}
+        etag = make_etag(entry.hash)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        logger.info(f"Reading file {name} from workspace {workspace.id}")
+        response.headers["ETag"] = etag
+        return {"filename": name, "content": await get_file_content_async(os.path.dirname(entry.path), os.path.basename(entry.path))}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error reading file {name}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
-@app.post("/update_file")
-def update_file(data: UpdateFileRequest):
+@api.post("/update_file")
+async def update_file(data: UpdateFileRequest, workspace: Workspace = Depends(get_or_create_workspace)):
     try:
-        # Handle paths correctly
-        if data.filename.startswith('public/'):
-            filepath = os.path.join(PUBLIC_DIR, data.filename.replace('public/', ''))
-        elif data.filename.startswith('src/'):
-            filepath = os.path.join(PROJECT_DIR, data.filename.replace('src/', ''))
-        else:
-            # If no prefix, try to determine the correct directory
-            if data.filename.endswith('.html'):
-                filepath = os.path.join(PUBLIC_DIR, data.filename)
-            else:
-                filepath = os.path.join(PROJECT_DIR, data.filename)
-            
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(data.content)
-            
-        return {"message": "File updated"}
+        directory, relative = workspace.split_path(data.filename, for_write=True)
+        version = await commit_workspace_files(
+            workspace, {os.path.join(directory, normalize_filename(relative)): data.content}, "update_file"
+        )
+        return {"message": "File updated", "version": version}
+    except WorkspaceQuotaError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating file {data.filename}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error updating file: {str(e)}")
 
-@app.get("/preview/{filename}")
-def serve_preview(filename: str):
+@api.post("/rollback")
+async def rollback_workspace(workspace: Workspace = Depends(get_workspace)):
+    """Restore the files replaced by the workspace's last write and remove the ones it created."""
+    outcome = await run_file_io(rollback_snapshot, workspace.root)
+    if outcome is None:
+        raise HTTPException(status_code=409, detail="Nothing to roll back")
+    restored, removed = outcome
+    await run_file_io(record_workspace_writes, workspace, {}, restored + removed)
+    version = await run_file_io(record_workspace_version, workspace, "rollback")
+    def names(paths: list) -> list:
+        return sorted(os.path.relpath(path, workspace.root).replace(os.sep, "/") for path in paths)
+
+    return {"message": "Rolled back", "restored": names(restored), "removed": names(removed), "version": version}
+
+def version_summary(manifest: dict) -> dict:
+    summary = {key: value for key, value in manifest.items() if key != "files"}
+    summary["files"] = len(manifest["files"])
+    return summary
+
+@api.get("/versions")
+async def list_versions(workspace: Workspace = Depends(get_workspace)):
+    """List the workspace's recorded versions, newest first."""
+    def load() -> list:
+        manifests = (version_store.get(workspace.id, number) for number in reversed(version_store.versions(workspace.id)))
+        return [version_summary(manifest) for manifest in manifests if manifest is not None]
+
+    versions = await run_file_io(load)
+    return {"workspace": workspace.id, "head": versions[0]["version"] if versions else None, "versions": versions}
+
+@api.get("/versions/diff")
+async def diff_versions(
+    from_version: int = Query(..., alias="from"),
+    to_version: int = Query(None, alias="to", description="Defaults to the latest version"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    """Return per-file changes between two versions, with unified diffs for text files."""
+    if to_version is None:
+        versions = await run_file_io(version_store.versions, workspace.id)
+        if not versions:
+            raise HTTPException(status_code=404, detail="No versions recorded")
+        to_version = versions[-1]
     try:
-        # Handle paths correctly
-        if filename.startswith('public/'):
-            filepath = os.path.join(PUBLIC_DIR, filename.replace('public/', ''))
-        elif filename.startswith('src/'):
-            filepath = os.path.join(PROJECT_DIR, filename.replace('src/', ''))
-        else:
-            # If no prefix, try both directories
-            public_path = os.path.join(PUBLIC_DIR, filename)
-            src_path = os.path.join(PROJECT_DIR, filename)
-            
-            if os.path.exists(public_path):
-                filepath = public_path
-            elif os.path.exists(src_path):
-                filepath = src_path
-            else:
+        return await run_file_io(version_store.diff, workspace.id, from_version, to_version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Version {e.args[0]} not found")
+    except MissingBlobError:
+        raise HTTPException(status_code=410, detail="A compared version references content that is no longer stored")
+
+@api.post("/versions/{version}/restore")
+async def restore_version(version: int, workspace: Workspace = Depends(get_workspace)):
+    """Make ``version`` the latest version again, rewriting only the files that differ from it."""
+    manifest = await run_file_io(version_store.get, workspace.id, version)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail=f"Version {version} not found")
+
+    def plan():
+        index = file_indexes.get(workspace)
+        index.scan()
+        current = index.entries()
+        contents = {
+            os.path.join(workspace.root, *name.split("/")): version_store.get_blob(blob_hash)
+            for name, blob_hash in manifest["files"].items()
+            if name not in current or current[name].hash != blob_hash
+        }
+        remove = [entry.path for name, entry in current.items() if name not in manifest["files"]]
+        return contents, remove
+
+    try:
+        contents, remove = await run_file_io(plan)
+    except MissingBlobError:
+        raise HTTPException(status_code=410, detail=f"Version {version} references content that is no longer stored")
+    if contents or remove:
+        try:
+            await commit_workspace_files(workspace, contents, remove=remove)
+        except WorkspaceQuotaError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    new_version = await run_file_io(record_workspace_version, workspace, "restore", version)
+    def names(paths) -> list:
+        return sorted(os.path.relpath(path, workspace.root).replace(os.sep, "/") for path in paths)
+
+    return {
+        "message": f"Restored version {version}",
+        "version": new_version,
+        "written": names(contents),
+        "removed": names(remove),
+    }
+
+@api.get("/preview/{workspace_id}/{filename:path}")
+async def serve_preview(
+    filename: str,
+    request: Request,
+    workspace: Workspace = Depends(get_path_workspace),
+    if_none_match: str = Header(None),
+):
+    try:
+        # Recently validated files are served from memory without touching the disk
+        content = content_cache.get_fresh(workspace.id, filename)
+        if content is None:
+            entry = await run_file_io(lookup_workspace_file, workspace, filename)
+            if entry is None:
                 raise HTTPException(status_code=404, detail="File not found")
-            
-        if not os.path.isfile(filepath):
-            raise HTTPException(status_code=404, detail="File not found")
-        return FileResponse(filepath)
+            content = content_cache.get_valid(workspace.id, filename, entry.path, entry.hash)
+            if content is None and entry.size <= content_cache.max_entry_bytes:
+                content = await run_file_io(load_preview_content, workspace, filename, entry)
+            if content is None:
+                # Too large to cache: stream it from disk (FileResponse handles Range)
+                etag = make_etag(entry.hash)
+                if etag_matches(if_none_match, etag):
+                    return Response(status_code=304, headers={"ETag": etag})
+                return FileResponse(entry.path, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return cached_content_response(request, content)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error serving preview for {filename}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error serving preview: {str(e)}")
 
-@app.post("/auto-fix-error")
-async def auto_fix_error(req: AutoFixErrorRequest):
-    logger.info(f"Received auto-fix request for file: {req.filename}")
-    system_prompt = (
-        "You are an expert fullstack developer and code fixer. Given the following error message, stack trace, and code, suggest a patch or fixed code to resolve the error. "
-        "Return ONLY the fixed code, or a unified diff if appropriate. Do not include explanations.\n\n"
-        f"Error message: {req.error_message}\n"
-        f"Stack trace: {req.stack_trace}\n"
-        f"Filename: {req.filename}\n"
-        f"Code:\n{req.file_content}\n"
-        "---\n"
-        "Respond with the fixed code or a patch."
+@api.get("/stats/preview-cache")
+def preview_cache_stats():
+    return content_cache.stats()
+
+def is_applicable_diff(content: str) -> bool:
+    try:
+        return bool(parse_unified_diff(content))
+    except PatchError:
+        return False
+
+def auto_fix_output_tokens(req: AutoFixErrorRequest, code: str) -> int:
+    """Expected auto-fix completion: the code it rewrites plus reasoning about the error, at least the floor."""
+    expected = count_tokens(code) + count_tokens(req.error_message) + count_tokens(req.stack_trace or "")
+    return max(expected, AUTO_FIX_MIN_OUTPUT_TOKENS)
+
+async def auto_fix_with_patch(req: AutoFixErrorRequest, workspace: Workspace) -> dict:
+    """Send only the relevant regions of the file, then validate and apply the returned diff."""
+    if not req.filename:
+        raise HTTPException(status_code=400, detail="filename is required in patch mode")
+    try:
+        entry = await run_file_io(lookup_workspace_file, workspace, req.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    on_disk = entry is not None
+    filepath = entry.path if on_disk else None
+    if on_disk:
+        # The workspace copy is authoritative; file_content may be stale
+        content = await get_file_content_async(os.path.dirname(filepath), os.path.basename(filepath))
+    elif req.file_content:
+        content = req.file_content
+    else:
+        raise HTTPException(status_code=404, detail=f"File {req.filename} not found")
+
+    line_numbers = stack_trace_lines(f"{req.error_message}\n{req.stack_trace}", req.filename)
+    excerpt, lines_sent = build_context_excerpt(content, line_numbers, radius=AUTO_FIX_CONTEXT_LINES)
+    user_prompt = AUTO_FIX_PATCH_PROMPT.render(
+        error_message=req.error_message, stack_trace=req.stack_trace, filename=req.filename, excerpt=excerpt
     )
-    user_prompt = (
-        f"Error: {req.error_message}\n"
-        f"Stack trace: {req.stack_trace}\n"
-        f"Filename: {req.filename}\n"
-        f"Code:\n{req.file_content}\n"
+    context = {"lines_sent": lines_sent, "file_lines": len(content.splitlines()), "error_lines": line_numbers}
+    try:
+        completion = await request_completion(
+            user_prompt,
+            AUTO_FIX_PATCH_SYSTEM_PROMPT,
+            # A diff rewrites at most the excerpt
+            auto_fix_output_tokens(req, excerpt),
+            use_cache=not req.bypass_cache,
+            cache_if=is_applicable_diff,
+            priority=PRIORITY_INTERACTIVE,
+            route="auto_fix",
+        )
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Auto-fix error: {detail}")
+        return {"patch": "", "applied": False, "message": f"Auto-fix failed: {detail}", "context": context}
+
+    diff = extract_diff(completion["content"])
+    usage = {
+        key: completion[key] for key in ("prompt_tokens", "completion_tokens", "latency_ms", "cached", "model", "budget")
+    }
+    result = {"patch": diff, "filename": req.filename, "context": context, "usage": usage}
+    try:
+        with span("apply_patch"):
+            patched = apply_unified_diff(content, diff)
+    except PatchError as e:
+        logger.warning(f"Auto-fix patch for {req.filename} rejected: {str(e)}")
+        return {**result, "applied": False, "message": f"Suggested patch could not be applied: {str(e)}"}
+
+    written = on_disk and not req.dry_run
+    version = None
+    if written:
+        try:
+            version = await commit_workspace_files(workspace, {filepath: patched}, "auto_fix")
+        except WorkspaceQuotaError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    return {
+        **result,
+        "applied": True,
+        "written": written,
+        "version": version,
+        "content": patched,
+        "message": "Patch applied." if written else "Patch validated.",
+    }
+
+@api.post("/auto-fix-error")
+async def auto_fix_error(req: AutoFixErrorRequest, workspace_id: str = Depends(requested_workspace_id)):
+    logger.info(f"Received auto-fix request for file: {req.filename}")
+    if req.mode == "patch":
+        return await auto_fix_with_patch(req, open_workspace(workspace_id))
+
+    # The code goes in the user prompt only; the system prompt stays constant
+    user_prompt = AUTO_FIX_PROMPT.render(
+        error_message=req.error_message, stack_trace=req.stack_trace, filename=req.filename, code=req.file_content
     )
     try:
-        patch = await call_llm_with_prompt(user_prompt, system_prompt)
+        patch = await call_llm_with_prompt(
+            user_prompt,
+            AUTO_FIX_SYSTEM_PROMPT,
+            # The fixed file is about as long as the original
+            auto_fix_output_tokens(req, req.file_content),
+            use_cache=not req.bypass_cache,
+            cache_if=lambda content: bool(content.strip()),
+            priority=PRIORITY_INTERACTIVE,
+            route="auto_fix",
+        )
         if not patch.strip():
             return {"patch": "", "message": "No fix could be suggested by the AI."}
         return {"patch": patch, "message": "Suggested fix generated."}
     except Exception as e:
         logger.error(f"Auto-fix error: {str(e)}")
         return {"patch": "", "message": f"Auto-fix failed: {str(e)}"}
-@app.get("/download")
-def download_app():
-    source_folder = current_dir.parent / "projects"
-    output_zip = "app_download.zip"
+
+@api.get("/download")
+async def download_app(
+    workspace: Workspace = Depends(get_workspace),
+    compression: Literal["deflate", "store"] = "deflate",
+    level: int = Query(6, ge=0, le=9),
+):
+    source_folder = workspace.root
 
     if not os.path.exists(source_folder):
         return {"error": "Source folder does not exist"}
 
-    shutil.make_archive("app_download", 'zip', source_folder)
-    return FileResponse(path=output_zip, filename="MyApp.zip", media_type='application/zip')
+    manifest = await run_file_io(build_manifest, source_folder)
+    archive_key = manifest_hash(manifest, compression, level)
+    headers = {
+        "Content-Disposition": 'attachment; filename="MyApp.zip"',
+        "ETag": f'"{archive_key}"',
+    }
+    archive_cache = getattr(app.state, "archive_cache", None)
+    if archive_cache is not None:
+        cached = archive_cache.get(archive_key)
+        if cached is not None:
+            logger.info(f"Serving cached archive for workspace {workspace.id}")
+            return Response(content=cached, media_type='application/zip', headers=headers)
+
+    # Sync generator: Starlette iterates it in a worker thread, so reads and compression stay off the loop
+    chunks = iter_zip_chunks(manifest, compression, level)
+    if archive_cache is not None:
+        chunks = iter_and_cache(chunks, archive_cache, archive_key)
+    return StreamingResponse(chunks, media_type='application/zip', headers=headers)
+
+@api.get("/stats/archive-cache")
+def archive_cache_stats():
+    archive_cache = getattr(app.state, "archive_cache", None)
+    return archive_cache.stats() if archive_cache is not None else {"enabled": False}
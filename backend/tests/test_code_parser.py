@@ -0,0 +1,97 @@
+import pytest
+
+from utils.code_parser import IncrementalCodeBlockParser, iter_code_blocks, parse_code_blocks
+
+RESPONSE = """Here is your app.
+
+```public/index.html
+<div id="root"></div>
+```
+
+````src/Docs.js
+// Shows how to call the API:
+// ```js
+// fetch("/api")
+// ```
+export default function Docs() {}
+````
+
+```README.md
+# Todo
+
+```bash
+npm install
+```
+
+Then open the app.
+```
+
+~~~src/App.css
+.app { content: "```"; }
+~~~
+
+```
+unnamed block
+```
+
+```src/App.js
+export default function App() {}
+```
+"""
+
+EXPECTED = [
+    ("public/index.html", '<div id="root"></div>'),
+    ("src/Docs.js", '// Shows how to call the API:\n// ```js\n// fetch("/api")\n// ```\nexport default function Docs() {}'),
+    ("README.md", "# Todo\n\n```bash\nnpm install\n```\n\nThen open the app."),
+    ("src/App.css", '.app { content: "```"; }'),
+    ("src/App.js", "export default function App() {}"),
+]
+
+def feed_in_chunks(chunks) -> list:
+    parser = IncrementalCodeBlockParser()
+    files = []
+    for chunk in chunks:
+        files.extend(parser.feed(chunk))
+    return files + parser.close()
+
+def test_parses_nested_fences_and_readmes():
+    assert list(parse_code_blocks(RESPONSE).items()) == EXPECTED
+
+def test_incremental_parser_matches_for_every_split():
+    assert feed_in_chunks([RESPONSE]) == EXPECTED
+    assert feed_in_chunks(RESPONSE) == EXPECTED  # One character at a time
+    for split in range(1, len(RESPONSE)):
+        assert feed_in_chunks([RESPONSE[:split], RESPONSE[split:]]) == EXPECTED, split
+
+@pytest.mark.parametrize("size", [2, 3, 7, 16, 64])
+def test_incremental_parser_matches_for_fixed_size_chunks(size):
+    assert feed_in_chunks(RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)) == EXPECTED
+
+def test_files_are_returned_by_the_chunk_that_closes_them():
+    parser = IncrementalCodeBlockParser()
+    assert parser.feed("```src/a.js\nconst a = 1;\n") == []
+    assert parser.feed("``") == []
+    assert parser.feed("`\n```src/b.js\n") == [("src/a.js", "const a = 1;")]
+    assert parser.close() == []  # Unterminated src/b.js is dropped
+
+def test_bytes_give_the_same_blocks():
+    blocks = iter_code_blocks(RESPONSE)
+    encoded = iter_code_blocks(RESPONSE.encode("utf-8"))
+    assert [block.filename for block in encoded] == [block.filename for block in blocks]
+    assert [block.code(RESPONSE.encode("utf-8")).decode("utf-8") for block in encoded] == [
+        block.code(RESPONSE) for block in blocks
+    ]
+
+def test_fence_after_code_on_the_same_line_does_not_close_the_block():
+    # Only a fence on its own line closes a block; earlier versions ended the block at "x```"
+    text = "```src/a.js\nconst x = 1;```\nconst y = 2;\n```\n"
+    assert parse_code_blocks(text) == {"src/a.js": "const x = 1;```\nconst y = 2;"}
+    assert feed_in_chunks([text]) == [("src/a.js", "const x = 1;```\nconst y = 2;")]
+
+def test_backticks_in_the_info_string_are_inline_code():
+    text = "```src/a.js `x`\n```src/b.js\nb\n```\n"
+    assert parse_code_blocks(text) == {"src/b.js": "b"}
+
+def test_filename_attributes_in_the_info_string():
+    text = "```jsx title=\"src/App.jsx\"\napp\n```\n"
+    assert parse_code_blocks(text) == {"src/App.jsx": "app"}
@@ -0,0 +1,41 @@
+from utils.file_index import WorkspaceIndex
+
+def make_index(tmp_path) -> WorkspaceIndex:
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "App.js").write_text("app")
+    (tmp_path / "src" / "old.js").write_text("old")
+    index = WorkspaceIndex(str(tmp_path))
+    index.scan()
+    return index
+
+def test_changes_since_token(tmp_path):
+    index = make_index(tmp_path)
+    token, files = index.files()
+    assert files == ["App.js", "old.js"]
+
+    (tmp_path / "src" / "App.js").write_text("changed")
+    index.record_write(str(tmp_path / "src" / "App.js"))
+    (tmp_path / "src" / "old.js").unlink()
+    index.scan()
+
+    new_token, changed, deleted, reset = index.changes_since(token)
+    assert not reset
+    assert [entry.name for entry in changed] == ["src/App.js"]
+    assert deleted == ["old.js"]
+    assert index.changes_since(new_token)[1:] == ([], [], False)
+
+def test_token_from_another_index_resets(tmp_path):
+    index = make_index(tmp_path)
+    token, _ = index.files()
+    # Same files and version, but another process (or lifetime) built this index
+    other = WorkspaceIndex(str(tmp_path))
+    other.scan()
+    _, changed, deleted, reset = other.changes_since(token)
+    assert reset
+    assert [entry.name for entry in changed] == ["src/App.js", "src/old.js"]
+    assert deleted == []
+
+def test_malformed_or_future_token_resets(tmp_path):
+    index = make_index(tmp_path)
+    for token in ("", "2", f"{index.epoch}.x", f"{index.epoch}.{index.version + 1}"):
+        assert index.changes_since(token)[3], token
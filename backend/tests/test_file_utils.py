@@ -0,0 +1,40 @@
+from utils import file_utils
+from utils.file_utils import forget_workspace_lock, rollback_snapshot, write_files_atomic
+
+def test_extended_snapshot_rolls_back_every_write(tmp_path):
+    root = tmp_path
+    (root / "src").mkdir()
+    app = root / "src" / "App.js"
+    app.write_text("original")
+    write_files_atomic(str(root), {str(app): "first"})
+    write_files_atomic(str(root), {str(app): "second", str(root / "src" / "new.js"): "new"}, extend_snapshot=True)
+    write_files_atomic(str(root), {str(root / "src" / "index.js"): "index"}, extend_snapshot=True)
+
+    restored, removed = rollback_snapshot(str(root))
+    assert restored == [str(app)]
+    assert sorted(removed) == [str(root / "src" / "index.js"), str(root / "src" / "new.js")]
+    # The version from before the first write, not the one the second write replaced
+    assert app.read_text() == "original"
+    assert rollback_snapshot(str(root)) is None
+
+def test_new_snapshot_replaces_the_previous_one(tmp_path):
+    root = tmp_path
+    (root / "src").mkdir()
+    app = root / "src" / "App.js"
+    app.write_text("original")
+    write_files_atomic(str(root), {str(app): "first"})
+    write_files_atomic(str(root), {str(app): "second"})
+    rollback_snapshot(str(root))
+    assert app.read_text() == "first"
+
+def test_extend_without_a_snapshot_starts_one(tmp_path):
+    root = tmp_path
+    (root / "src").mkdir()
+    write_files_atomic(str(root), {str(root / "src" / "a.js"): "a"}, extend_snapshot=True)
+    assert rollback_snapshot(str(root)) == ([], [str(root / "src" / "a.js")])
+
+def test_forgotten_workspace_lock_is_dropped(tmp_path):
+    write_files_atomic(str(tmp_path), {str(tmp_path / "src" / "a.js"): "a"})
+    assert str(tmp_path) in file_utils._root_locks
+    forget_workspace_lock(str(tmp_path))
+    assert str(tmp_path) not in file_utils._root_locks
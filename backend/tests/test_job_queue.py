@@ -0,0 +1,30 @@
+import asyncio
+
+from utils.job_queue import JobQueue, JobStore
+
+def test_worker_survives_a_job_whose_outcome_cannot_be_stored(tmp_path):
+    async def scenario():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=1, poll_interval=0.01)
+
+        async def handler(payload, progress):
+            # A result that cannot be JSON-encoded makes store.finish raise
+            return {"value": object()} if payload["broken"] else {"value": payload["n"]}
+
+        queue.register("test", handler)
+        await queue.start()
+        try:
+            broken = await queue.submit("test", {"broken": True})
+            ok = await queue.submit("test", {"broken": False, "n": 1})
+            for _ in range(200):
+                if queue.store.get(ok)["status"] == "succeeded":
+                    break
+                await asyncio.sleep(0.01)
+            assert queue.store.get(ok)["result"] == {"value": 1}
+            # Still leased by the dead attempt; it is resumed once the lease lapses
+            assert queue.store.get(broken)["status"] == "running"
+            assert queue.counters["errors"] == 1
+        finally:
+            await queue.stop()
+            queue.store.close()
+
+    asyncio.run(scenario())
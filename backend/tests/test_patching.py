@@ -0,0 +1,95 @@
+import pytest
+
+from utils.patching import (
+    PatchError, apply_unified_diff, build_context_excerpt, extract_diff, parse_unified_diff, stack_trace_lines,
+)
+
+APP = "import React from 'react';\n\nfunction App() {\n  const items = null;\n  return <ul>{items.map(i => <li>{i}</li>)}</ul>;\n}\n\nexport default App;\n"
+
+FIX = """--- a/src/App.js
++++ b/src/App.js
+@@ -3,4 +3,4 @@
+ function App() {
+-  const items = null;
++  const items = [];
+   return <ul>{items.map(i => <li>{i}</li>)}</ul>;
+ }
+"""
+
+def test_applies_a_patch():
+    assert apply_unified_diff(APP, FIX) == APP.replace("const items = null;", "const items = [];")
+
+def test_finds_a_hunk_whose_header_is_off():
+    shifted = "// banner\n// banner\n" + APP
+    assert apply_unified_diff(shifted, FIX) == shifted.replace("null;", "[];")
+
+def test_prefers_the_match_closest_to_the_header():
+    content = "x = 1\ny = 2\nx = 1\ny = 2\n"
+    diff = "@@ -3,2 +3,2 @@\n x = 1\n-y = 2\n+y = 3\n"
+    assert apply_unified_diff(content, diff) == "x = 1\ny = 2\nx = 1\ny = 3\n"
+
+def test_falls_back_to_matching_without_surrounding_whitespace():
+    # Context re-indented with tabs by the model
+    diff = "@@ -3,2 +3,2 @@\n function App() {\n-\tconst items = null;\n+\tconst items = [];\n"
+    assert apply_unified_diff(APP, diff) == APP.replace("  const items = null;", "\tconst items = [];")
+
+def test_strips_line_number_prefixes_copied_from_the_excerpt():
+    diff = "@@ -3,2 +3,2 @@\n 3| function App() {\n-4|   const items = null;\n+4|   const items = [];\n"
+    assert apply_unified_diff(APP, diff) == APP.replace("null;", "[];")
+
+def test_keeps_numbers_that_are_part_of_the_code():
+    hunk, = parse_unified_diff("@@ -1 +1 @@\n-1| a\n+x = 1\n")
+    assert hunk.old_lines == ["1| a"]
+
+def test_pure_insertion_uses_the_header_position():
+    diff = "@@ -1,0 +2,1 @@\n+import './App.css';\n"
+    patched = apply_unified_diff(APP, diff)
+    assert patched.splitlines()[:3] == ["import React from 'react';", "import './App.css';", ""]
+
+def test_applies_several_hunks_in_order():
+    diff = "@@ -1 +1 @@\n-import React from 'react';\n+import React, { useState } from 'react';\n" + FIX.split("\n", 2)[2]
+    patched = apply_unified_diff(APP, diff)
+    assert patched.startswith("import React, { useState } from 'react';\n")
+    assert "const items = [];" in patched
+
+def test_rejects_a_hunk_that_does_not_match():
+    diff = "@@ -4 +4 @@\n-  const items = undefined;\n+  const items = [];\n"
+    with pytest.raises(PatchError, match="Hunk 1"):
+        apply_unified_diff(APP, diff)
+
+def test_rejects_a_diff_without_changes():
+    with pytest.raises(PatchError):
+        apply_unified_diff(APP, "I could not find the bug.")
+    with pytest.raises(PatchError):
+        apply_unified_diff(APP, "@@ -1 +1 @@\n import React from 'react';\n")
+
+def test_keeps_the_missing_final_newline():
+    assert apply_unified_diff("a\nb", "@@ -2 +2 @@\n-b\n+c\n") == "a\nc"
+
+def test_unwraps_a_fenced_diff_and_ignores_prose():
+    text = "Here is the fix:\n\n```diff\n" + FIX + "```\n\nThis initialises the list."
+    assert extract_diff(text) == FIX.rstrip("\n")
+    assert apply_unified_diff(APP, text) == APP.replace("null;", "[];")
+
+def test_stack_trace_lines_match_the_file_by_basename():
+    trace = (
+        "TypeError: Cannot read properties of null (reading 'map')\n"
+        "    at App (http://localhost:3000/static/js/src/App.js:5:31)\n"
+        "    at renderWithHooks (react-dom.development.js:16305:18)\n"
+        "    in App (at C:\\project\\src\\App.js line 12)\n"
+        "    at Other (src/components/MyApp.js:9:1)\n"
+    )
+    assert stack_trace_lines(trace, "src/App.js") == [5, 12]
+    assert stack_trace_lines(None, "App.js") == []
+
+def test_context_excerpt_keeps_imports_and_the_reported_lines():
+    content = "\n".join(["import a from 'a';"] + [f"line {number}" for number in range(2, 101)])
+    excerpt, shown = build_context_excerpt(content, [50], radius=2)
+    assert excerpt.splitlines() == ["  1| import a from 'a';", "...", " 48| line 48", " 49| line 49", " 50| line 50",
+                                    " 51| line 51", " 52| line 52", "..."]
+    assert shown == 6
+
+def test_context_excerpt_falls_back_to_the_whole_file():
+    excerpt, shown = build_context_excerpt("a\nb", [99])
+    assert excerpt == "1| a\n2| b"
+    assert shown == 2
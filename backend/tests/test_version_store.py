@@ -0,0 +1,81 @@
+import os
+import hashlib
+
+import pytest
+
+from utils.version_store import MissingBlobError, VersionStore, unified_diff
+
+def make_store(tmp_path, **kwargs) -> VersionStore:
+    store = VersionStore(str(tmp_path / "store"), **kwargs)
+    store.load()
+    return store
+
+def record_files(store: VersionStore, tmp_path, files: dict, source: str = "test"):
+    entries = {}
+    for name, content in files.items():
+        path = tmp_path / "workspace" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content.encode("utf-8"))
+        entries[name] = (str(path), hashlib.sha256(content.encode("utf-8")).hexdigest())
+    return store.record("ws", entries, source)
+
+def test_diff_marks_last_line_without_newline():
+    diff = unified_diff("v1", "v2", "a/f", "b/f")
+    assert diff == "--- a/f\n+++ b/f\n@@ -1 +1 @@\n-v1\n\\ No newline at end of file\n+v2\n\\ No newline at end of file\n"
+
+def test_diff_keeps_terminated_lines_unchanged():
+    diff = unified_diff("a\nb\n", "a\nc\n", "a/f", "b/f")
+    assert diff == "--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n a\n-b\n+c\n"
+
+def test_diff_between_versions(tmp_path):
+    store = make_store(tmp_path)
+    first = record_files(store, tmp_path, {"src/App.js": "one\ntwo", "src/a.css": "x"})
+    second = record_files(store, tmp_path, {"src/App.js": "one\nthree", "src/a.css": "x"})
+    result = store.diff("ws", first["version"], second["version"])
+    changes = {change["name"]: change for change in result["files"]}
+    assert set(changes) == {"src/App.js"}
+    assert changes["src/App.js"]["diff"].endswith("+three\n\\ No newline at end of file\n")
+
+def test_unchanged_files_record_no_version(tmp_path):
+    store = make_store(tmp_path)
+    assert record_files(store, tmp_path, {"src/App.js": "x"})["version"] == 1
+    assert record_files(store, tmp_path, {"src/App.js": "x"}) is None
+
+def test_reused_blob_survives_gc(tmp_path):
+    store = make_store(tmp_path, max_versions=1, gc_grace_seconds=60)
+    record_files(store, tmp_path, {"src/App.js": "old"})
+    record_files(store, tmp_path, {"src/App.js": "new"})  # Prunes version 1, leaving "old" unreferenced
+    old_blob = store._blob_path(hashlib.sha256(b"old").hexdigest())
+    os.utime(old_blob, (0, 0))  # Past the grace period
+    manifest = record_files(store, tmp_path, {"src/App.js": "old"})
+    store.gc()
+    assert store.get_blob(manifest["files"]["src/App.js"]) == b"old"
+
+def test_gc_removes_unreferenced_blobs(tmp_path):
+    store = make_store(tmp_path, max_versions=1, gc_grace_seconds=60)
+    record_files(store, tmp_path, {"src/App.js": "old"})
+    record_files(store, tmp_path, {"src/App.js": "new"})
+    old_hash = hashlib.sha256(b"old").hexdigest()
+    os.utime(store._blob_path(old_hash), (0, 0))
+    assert store.gc()["blobs_removed"] == 1
+    with pytest.raises(MissingBlobError):
+        store.get_blob(old_hash)
+
+def disk_totals(store: VersionStore):
+    sizes = [entry.stat().st_size for prefix in os.scandir(store.objects_dir) for entry in os.scandir(prefix.path)]
+    return len(sizes), sum(sizes)
+
+def test_stats_keep_running_blob_totals(tmp_path):
+    store = make_store(tmp_path, max_versions=1, gc_grace_seconds=60)
+    record_files(store, tmp_path, {"src/App.js": "old", "src/a.css": "css"})
+    record_files(store, tmp_path, {"src/App.js": "new", "src/a.css": "css"})
+    stats = store.stats()
+    assert (stats["blobs"], stats["blob_bytes"]) == disk_totals(store) and stats["blobs"] == 3
+
+    os.utime(store._blob_path(hashlib.sha256(b"old").hexdigest()), (0, 0))
+    store.gc()
+    stats = store.stats()
+    assert (stats["blobs"], stats["blob_bytes"]) == disk_totals(store) and stats["blobs"] == 2
+
+    reloaded = make_store(tmp_path)
+    assert (reloaded.stats()["blobs"], reloaded.stats()["blob_bytes"]) == disk_totals(store)
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from utils.workspaces import WorkspaceManager, WorkspaceNotFoundError, WorkspaceQuotaError
+
+def test_concurrent_reservations_are_all_counted(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), quota_bytes=10_000)
+    manager.load()
+    workspace = manager.resolve("ws")
+    base = manager.usage_bytes(workspace)
+    start = threading.Barrier(8)
+
+    def reserve(index: int):
+        start.wait()
+        manager.reserve(workspace, {str(tmp_path / "ws" / "src" / f"f{index}.js"): 100})
+
+    threads = [threading.Thread(target=reserve, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert manager.usage_bytes(workspace) == base + 800
+
+def test_release_returns_a_failed_write_to_the_quota(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), quota_bytes=1000)
+    manager.load()
+    workspace = manager.resolve("ws")
+    target = str(tmp_path / "ws" / "src" / "big.js")
+    reserved = manager.reserve(workspace, {target: 900 - manager.usage_bytes(workspace)})
+    with pytest.raises(WorkspaceQuotaError):
+        manager.reserve(workspace, {target + ".2": 200})
+    manager.release(workspace, reserved)
+    manager.reserve(workspace, {target + ".2": 200})
+
+def test_files_written_by_another_process_count(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), quota_bytes=1000)
+    manager.load()
+    workspace = manager.resolve("ws")
+    manager.reserve(workspace, {str(tmp_path / "ws" / "src" / "a.js"): 10})
+    # Another worker's write, which this manager never reserved
+    (tmp_path / "ws" / "src" / "other.js").write_bytes(b"x" * 900)
+    with pytest.raises(WorkspaceQuotaError):
+        manager.reserve(workspace, {str(tmp_path / "ws" / "src" / "b.js"): 200})
+
+def test_resolve_without_create_never_makes_a_directory(tmp_path):
+    manager = WorkspaceManager(str(tmp_path))
+    manager.load()
+    with pytest.raises(WorkspaceNotFoundError):
+        manager.resolve("missing", create=False)
+    assert not (tmp_path / "missing").exists()
+    manager.resolve("ws")
+    assert manager.resolve("ws", create=False).id == "ws"
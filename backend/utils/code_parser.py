@@ -0,0 +1,200 @@
+import re
+import logging
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# A fence line: optional indentation, 3+ backticks or tildes, then the info string
+FENCE_LINE_PATTERN = re.compile(r"[ \t]*(`{3,}|~{3,})([^\n]*)")
+FENCE_LINE_PATTERN_BYTES = re.compile(rb"[ \t]*(`{3,}|~{3,})([^\n]*)")
+FILENAME_PATTERN = re.compile(r"^[\w.\-/+]+$")
+FILENAME_ATTRIBUTES = ("title", "file", "filename", "path", "name")
+MARKDOWN_EXTENSIONS = (".md", ".markdown", ".mdx")
+
+class CodeBlock(NamedTuple):
+    """A closed fenced block; ``start``/``end`` delimit its body in the scanned text."""
+    filename: Optional[str]
+    info: str
+    start: int
+    end: int
+
+    def code(self, text) -> str:
+        return text[self.start:self.end].strip()
+
+def filename_from_info(info: str) -> Optional[str]:
+    """Pick the file name out of an info string such as ``src/App.js`` or ``js title=src/App.js``."""
+    tokens = info.split()
+    if not tokens:
+        return None
+    for token in tokens[1:]:
+        key, sep, value = token.partition("=")
+        if sep and key.lower() in FILENAME_ATTRIBUTES:
+            return value.strip("\"'") or None
+    return tokens[0] if FILENAME_PATTERN.match(tokens[0]) else None
+
+class FenceScanner:
+    """Line-oriented state machine over fenced code blocks.
+
+    Each line is inspected once, and only fence lines are sliced out of the
+    text, so scanning is linear in the input. Following CommonMark, a block is
+    closed by a bare fence of the same character at least as long as the
+    opening one, so a file wrapped in ```````` may contain ``` fences. Markdown
+    files additionally track same-length fences that carry an info string as
+    nested blocks, which is how models usually emit a README.
+    """
+
+    def __init__(self):
+        self._fence = None  # (character, length) of the open block
+        self._info = ""
+        self._filename = None
+        self._nested = False
+        self._depth = 0
+        self.body_start = 0
+
+    @property
+    def in_block(self) -> bool:
+        return self._fence is not None
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self._filename
+
+    def rebase(self, consumed: int):
+        """Shift offsets after the caller dropped the first ``consumed`` characters of its text."""
+        self.body_start = max(0, self.body_start - consumed)
+
+    def reset(self):
+        self._fence = None
+        self._info = ""
+        self._filename = None
+        self._depth = 0
+
+    def scan(self, text, pos: int = 0, final: bool = False):
+        """Scan complete lines of ``text`` (str or bytes) from ``pos``.
+
+        Returns ``(blocks, pos)``: the blocks closed along the way and the offset of
+        the first line not yet scanned. With ``final`` a trailing line without a
+        newline is scanned too.
+        """
+        if isinstance(text, str):
+            newline, pattern = "\n", FENCE_LINE_PATTERN
+        else:
+            newline, pattern = b"\n", FENCE_LINE_PATTERN_BYTES
+        length = len(text)
+        blocks = []
+        while pos < length:
+            line_end = text.find(newline, pos)
+            if line_end == -1:
+                if not final:
+                    break
+                line_end = next_pos = length
+            else:
+                next_pos = line_end + 1
+            match = pattern.match(text, pos, line_end)
+            if match is not None:
+                block = self._fence_line(match, pos, next_pos)
+                if block is not None:
+                    blocks.append(block)
+            pos = next_pos
+        return blocks, pos
+
+    def _fence_line(self, match, line_start: int, next_pos: int):
+        fence, rest = match.group(1), match.group(2).strip()
+        if isinstance(fence, bytes):
+            fence, rest = fence.decode("ascii"), rest.decode("utf-8", "replace")
+        char, length = fence[0], len(fence)
+        # An info string after backticks may not contain backticks (that is inline code)
+        if char == "`" and "`" in rest:
+            return None
+
+        if self._fence is None:
+            self._fence = (char, length)
+            self._info = rest
+            self._filename = filename_from_info(rest)
+            self._nested = bool(self._filename) and self._filename.lower().endswith(MARKDOWN_EXTENSIONS)
+            self._depth = 0
+            self.body_start = next_pos
+            return None
+
+        open_char, open_length = self._fence
+        if char != open_char or length < open_length:
+            return None
+        if rest:
+            if self._nested and length == open_length:
+                self._depth += 1
+            return None
+        if self._depth:
+            self._depth -= 1
+            return None
+
+        block = CodeBlock(self._filename, self._info, self.body_start, line_start)
+        self.reset()
+        return block
+
+def iter_code_blocks(text) -> list:
+    """Return every closed fenced block in ``text``; an unterminated trailing block is ignored."""
+    blocks, _ = FenceScanner().scan(text, final=True)
+    return blocks
+
+def parse_code_blocks(text) -> dict:
+    """Map file name to stripped code for every named, non-empty block (later blocks win)."""
+    files = {}
+    for block in iter_code_blocks(text):
+        if block.filename:
+            code = block.code(text)
+            if code:
+                files[block.filename] = code
+    return files
+
+class IncrementalCodeBlockParser:
+    """Parse fenced code blocks from a completion that arrives in chunks.
+
+    Each call to ``feed`` returns the files whose closing fence arrived in that
+    chunk, so callers can persist them before the rest of the response exists.
+    Only the partial last line and the body of the open block are retained, and
+    each character is scanned once however the response is split.
+    """
+
+    def __init__(self):
+        self._scanner = FenceScanner()
+        self._partial = []  # Chunks of the current line before its newline arrives
+        self._body = []  # Body of the open block from earlier chunks
+
+    def feed(self, chunk: str) -> list:
+        self._partial.append(chunk)
+        if "\n" not in chunk:
+            return []
+        text = "".join(self._partial)
+        self._partial = []
+        return self._scan(text, final=False)
+
+    def close(self) -> list:
+        """Flush the trailing partial line; an unterminated block is dropped."""
+        text = "".join(self._partial)
+        self._partial = []
+        completed = self._scan(text, final=True)
+        if self._scanner.in_block:
+            logger.warning(f"Discarding unterminated code block for {self._scanner.filename}")
+            self._scanner.reset()
+            self._body = []
+        return completed
+
+    def _scan(self, text: str, final: bool) -> list:
+        was_open = self._scanner.in_block
+        blocks, pos = self._scanner.scan(text, final=final)
+        completed = []
+        for index, block in enumerate(blocks):
+            body = text[block.start:block.end]
+            if index == 0 and was_open:
+                self._body.append(body)
+                body = "".join(self._body)
+                self._body = []
+            code = body.strip()
+            if block.filename and code:
+                completed.append((block.filename, code))
+        if self._scanner.in_block and pos > self._scanner.body_start:
+            self._body.append(text[self._scanner.body_start:pos])
+        if pos < len(text):
+            self._partial.append(text[pos:])
+        self._scanner.rebase(pos)
+        return completed
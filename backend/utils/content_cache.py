@@ -0,0 +1,147 @@
+import os
+import gzip
+import time
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+class CachedContent:
+    """A file's bytes with its validators and precompressed variants."""
+
+    def __init__(self, path: str, data: bytes, content_hash: str, mtime: float, min_compress_bytes: int = 256):
+        self.path = path
+        self.data = data
+        self.hash = content_hash
+        self.mtime = mtime
+        self.media_type = mimetypes.guess_type(path)[0] or "text/plain"
+        self.checked_at = time.monotonic()
+        self.variants = {}
+        if len(data) >= min_compress_bytes and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            # Variants are only kept when they actually save bytes
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+                if len(compressed) < len(data):
+                    self.variants["br"] = compressed
+            compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+            if len(compressed) < len(data):
+                self.variants["gzip"] = compressed
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + sum(len(variant) for variant in self.variants.values())
+
+class ContentCache:
+    """Byte-bounded LRU of small workspace files, keyed by absolute path.
+
+    ``(workspace, name)`` aliases remember which path a client name resolved to,
+    so a fresh hit is served without touching the filesystem; entries older than
+    ``revalidate_seconds`` are re-checked against the file index first.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entry_bytes: int = 1024 * 1024,
+                 revalidate_seconds: float = 2.0, min_compress_bytes: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.min_compress_bytes = min_compress_bytes
+        self._entries = OrderedDict()
+        self._aliases = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "invalidations": 0, "evictions": 0}
+
+    def get_fresh(self, workspace_id: str, name: str):
+        """Return the cached file for a client name if it was validated recently enough, else None."""
+        with self._lock:
+            path = self._aliases.get((workspace_id, name))
+            content = self._entries.get(path) if path is not None else None
+            if content is None and path is not None:
+                del self._aliases[(workspace_id, name)]  # Points at an evicted or invalidated file
+            if content is None or time.monotonic() - content.checked_at > self.revalidate_seconds:
+                return None
+            self._entries.move_to_end(path)
+            self.counters["hits"] += 1
+            return content
+
+    def get_valid(self, workspace_id: str, name: str, path: str, content_hash: str):
+        """Return the cached file if it still matches ``content_hash`` (from the file index)."""
+        with self._lock:
+            content = self._entries.get(path)
+            if content is None or content.hash != content_hash:
+                self.counters["misses"] += 1
+                return None
+            content.checked_at = time.monotonic()
+            self._aliases[(workspace_id, name)] = path
+            self._entries.move_to_end(path)
+            self.counters["revalidated"] += 1
+            return content
+
+    def store(self, workspace_id: str, name: str, path: str, data: bytes, content_hash: str, mtime: float):
+        """Cache ``data`` (compressing it now, off the request path) and return the entry, or None if too large."""
+        if len(data) > self.max_entry_bytes:
+            self.invalidate(path)
+            return None
+        content = CachedContent(path, data, content_hash, mtime, self.min_compress_bytes)
+        with self._lock:
+            self._discard(path)
+            self._entries[path] = content
+            self._bytes += content.size
+            if name is not None:
+                self._aliases[(workspace_id, name)] = path
+            self.counters["stores"] += 1
+            while self._bytes > self.max_bytes and self._entries:
+                evicted_path, _ = next(iter(self._entries.items()))
+                self._discard(evicted_path)
+                self.counters["evictions"] += 1
+        return content
+
+    def _discard(self, path: str):
+        # Caller holds the lock; aliases pointing at a missing path simply miss
+        content = self._entries.pop(path, None)
+        if content is not None:
+            self._bytes -= content.size
+
+    def invalidate(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                self._discard(path)
+                self.counters["invalidations"] += 1
+
+    def forget_workspace(self, workspace_id: str, root: str):
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [path for path in self._entries if path.startswith(prefix)]:
+                self._discard(path)
+            for key in [key for key in self._aliases if key[0] == workspace_id]:
+                del self._aliases[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                brotli=brotli is not None,
+            )
+
+def create_content_cache() -> ContentCache:
+    return ContentCache(
+        max_bytes=env_int("PREVIEW_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+        max_entry_bytes=env_int("PREVIEW_CACHE_MAX_ENTRY_BYTES", 1024 * 1024),
+        revalidate_seconds=env_int("PREVIEW_CACHE_REVALIDATE", 2),
+        min_compress_bytes=env_int("PREVIEW_CACHE_MIN_COMPRESS_BYTES", 256),
+    )
@@ -0,0 +1,205 @@
+import os
+import time
+import secrets
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import NamedTuple
+from utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+INDEXED_DIRS = ("src", "public")
+
+class FileEntry(NamedTuple):
+    name: str  # Workspace-relative, e.g. "src/App.js"
+    path: str
+    size: int
+    mtime_ns: int
+    hash: str
+    version: int  # Journal version of the last change
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class WorkspaceIndex:
+    """In-memory index of one workspace's files with a bounded change journal.
+
+    Writes through the API are recorded directly; lookups re-validate the entry
+    with a single ``stat`` and rescans reconcile changes made behind our back.
+    """
+
+    def __init__(self, root: str, journal_size: int = 1000):
+        self.root = root
+        self.version = 0
+        # Versions only mean something to this index; clients get them tagged with its epoch
+        self.epoch = secrets.token_hex(4)
+        self.scanned_at = 0.0
+        self._entries = {}
+        self._journal = deque(maxlen=journal_size)  # (version, name)
+        self._lock = threading.Lock()
+
+    def _name_for(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _record(self, name: str, path: str, stat, content_hash: str = None):
+        # Caller holds the lock; an unchanged size and mtime skips re-hashing
+        entry = self._entries.get(name)
+        if content_hash is None:
+            if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+                return entry
+            content_hash = hash_file(path)
+        if entry is not None and entry.hash == content_hash:
+            # Touched but unchanged: refresh the stat fields without a journal entry
+            entry = entry._replace(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            self.version += 1
+            self._journal.append((self.version, name))
+            entry = FileEntry(name, path, stat.st_size, stat.st_mtime_ns, content_hash, self.version)
+        self._entries[name] = entry
+        return entry
+
+    def _remove(self, name: str):
+        # Caller holds the lock
+        if self._entries.pop(name, None) is not None:
+            self.version += 1
+            self._journal.append((self.version, name))
+
+    def scan(self):
+        """Reconcile the index with the directory tree."""
+        seen = set()
+        with self._lock:
+            for directory in INDEXED_DIRS:
+                for root, _, filenames in os.walk(os.path.join(self.root, directory)):
+                    for filename in filenames:
+                        path = os.path.join(root, filename)
+                        try:
+                            stat = os.stat(path)
+                            name = self._name_for(path)
+                            self._record(name, path, stat)
+                        except OSError:
+                            continue  # Removed while walking
+                        seen.add(name)
+            for name in [name for name in self._entries if name not in seen]:
+                self._remove(name)
+            self.scanned_at = time.monotonic()
+
+    def record_write(self, path: str, content: bytes = None):
+        """Update the entry for a file just written; ``content`` saves re-reading it to hash."""
+        name = self._name_for(path)
+        try:
+            content_hash = hashlib.sha256(content).hexdigest() if content is not None else hash_file(path)
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._remove(name)
+            return None
+        with self._lock:
+            return self._record(name, path, stat, content_hash)
+
+    def lookup(self, filename: str):
+        """Return the entry for a client file name, trying ``public/`` then ``src/`` for bare names."""
+        if filename.startswith(tuple(f"{directory}/" for directory in INDEXED_DIRS)):
+            candidates = [filename]
+        else:
+            candidates = [f"public/{filename}", f"src/{filename}"]
+        with self._lock:
+            for name in candidates:
+                entry = self._entries.get(os.path.normpath(name).replace(os.sep, "/"))
+                if entry is None:
+                    continue
+                try:
+                    return self._record(entry.name, entry.path, os.stat(entry.path))
+                except OSError:
+                    self._remove(entry.name)
+        return None
+
+    def entries(self) -> dict:
+        """Return a snapshot of ``{name: FileEntry}`` for every indexed file."""
+        with self._lock:
+            return dict(self._entries)
+
+    def _token(self) -> str:
+        # Caller holds the lock
+        return f"{self.epoch}.{self.version}"
+
+    def files(self, directory: str = "src"):
+        """Return ``(version token, names)`` for the files under ``directory``, relative to it."""
+        prefix = f"{directory}/"
+        with self._lock:
+            return self._token(), sorted(name[len(prefix):] for name in self._entries if name.startswith(prefix))
+
+    def changes_since(self, since: str, directory: str = "src"):
+        """Return ``(version token, changed entries, deleted names, reset)`` for changes after token ``since``.
+
+        ``reset`` is True when the token comes from another index (another worker
+        process, or before a restart or eviction), is malformed, or the journal no
+        longer reaches back that far; ``changed`` then lists every file.
+        """
+        prefix = f"{directory}/"
+        epoch, _, number = since.partition(".")
+        with self._lock:
+            oldest = self._journal[0][0] if self._journal else self.version + 1
+            if epoch != self.epoch or not number.isdigit() or not oldest - 1 <= int(number) <= self.version:
+                changed = [entry for name, entry in sorted(self._entries.items()) if name.startswith(prefix)]
+                return self._token(), changed, [], True
+            since = int(number)
+            names = set()
+            for version, name in reversed(self._journal):
+                if version <= since:
+                    break
+                if name.startswith(prefix):
+                    names.add(name)
+            changed = [self._entries[name] for name in sorted(names) if name in self._entries]
+            deleted = sorted(name[len(prefix):] for name in names if name not in self._entries)
+            return self._token(), changed, deleted, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"files": len(self._entries), "version": self.version, "journal": len(self._journal)}
+
+class FileIndexManager:
+    """Per-workspace file indexes, built on first use and rescanned when older than ``rescan_interval``."""
+
+    def __init__(self, rescan_interval: int = 30, journal_size: int = 1000):
+        self.rescan_interval = rescan_interval
+        self.journal_size = journal_size
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def get(self, workspace, fresh: bool = False) -> WorkspaceIndex:
+        """Return the workspace's index; ``fresh`` rescans it if the last scan is too old."""
+        with self._lock:
+            index = self._indexes.get(workspace.id)
+            if index is None or index.root != workspace.root:
+                index = self._indexes[workspace.id] = WorkspaceIndex(workspace.root, self.journal_size)
+        if not index.scanned_at or (fresh and time.monotonic() - index.scanned_at > self.rescan_interval):
+            index.scan()
+            self.scans += 1
+        return index
+
+    def forget(self, workspace_id: str):
+        with self._lock:
+            self._indexes.pop(workspace_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {
+            "workspaces": len(indexes),
+            "files": sum(index.stats()["files"] for index in indexes),
+            "scans": self.scans,
+            "rescan_interval": self.rescan_interval,
+        }
+
+def create_file_index_manager() -> FileIndexManager:
+    return FileIndexManager(
+        rescan_interval=env_int("FILE_INDEX_RESCAN_INTERVAL", 30),
+        journal_size=env_int("FILE_INDEX_JOURNAL_SIZE", 1000),
+    )
@@ -1,8 +1,27 @@
 import os
+import json
+import time
+import shutil
+import asyncio
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utils.config import env_int
 
 logger = logging.getLogger(__name__)
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Bounded pool for blocking filesystem work so it never runs on the event loop
+FILE_IO_THREADS = env_int("FILE_IO_THREADS", 8)
+_file_io_executor = None
+
 def setup_project_structure(base_dir: str):
     """Set up the project directory structure."""
     try:
@@ -22,43 +41,20 @@ def setup_project_structure(base_dir: str):
         logger.error(f"Error setting up project structure: {str(e)}")
         raise Exception(f"Error setting up project structure: {str(e)}")
 
-def save_file(directory: str, filename: str, content: str):
-    """Save a file to the specified directory."""
-    try:
-        # Remove any nested src/ or public/ prefixes
-        if filename.startswith('src/src/'):
-            filename = filename.replace('src/src/', 'src/')
-        elif filename.startswith('public/public/'):
-            filename = filename.replace('public/public/', 'public/')
-            
-        # Remove src/ or public/ prefix if present
-        if filename.startswith('src/'):
-            filename = filename.replace('src/', '')
-        elif filename.startswith('public/'):
-            filename = filename.replace('public/', '')
-            
-        filepath = os.path.join(directory, filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        logger.info(f"Saved file to {filepath}")
-    except Exception as e:
-        logger.error(f"Error saving file {filename}: {str(e)}")
-        raise Exception(f"Error saving file {filename}: {str(e)}")
+def normalize_filename(filename: str) -> str:
+    """Strip the ``src/``/``public/`` prefix (including doubled ones) from a name relative to its directory."""
+    # Remove any nested src/ or public/ prefixes
+    if filename.startswith('src/src/'):
+        filename = filename.replace('src/src/', 'src/')
+    elif filename.startswith('public/public/'):
+        filename = filename.replace('public/public/', 'public/')
 
-def list_files(directory: str) -> list:
-    """List all files in the specified directory."""
-    try:
-        files = []
-        for root, _, filenames in os.walk(directory):
-            for filename in filenames:
-                rel_path = os.path.relpath(os.path.join(root, filename), directory)
-                files.append(rel_path)
-        return files
-    except Exception as e:
-        logger.error(f"Error listing files: {str(e)}")
-        raise Exception(f"Error listing files: {str(e)}")
+    # Remove src/ or public/ prefix if present
+    if filename.startswith('src/'):
+        filename = filename.replace('src/', '')
+    elif filename.startswith('public/'):
+        filename = filename.replace('public/', '')
+    return filename
 
 def get_file_content(directory: str, filename: str) -> str:
     """Get the content of a file."""
@@ -78,3 +74,198 @@ def get_file_content(directory: str, filename: str) -> str:
     except Exception as e:
         logger.error(f"Error reading file {filename}: {str(e)}")
         raise Exception(f"Error reading file {filename}: {str(e)}")
+
+# === Transactional workspace writes ===
+# Hidden entries at the workspace root; they are never part of the project itself
+STAGING_PREFIX = ".staging-"
+SNAPSHOT_DIR = ".snapshot"
+LOCK_FILE = ".lock"
+STALE_STAGING_SECONDS = 3600
+_root_locks = {}
+_root_locks_guard = threading.Lock()
+
+@contextmanager
+def workspace_write_lock(root: str):
+    """Serialize writers of one workspace across threads and, where ``fcntl`` exists, processes."""
+    with _root_locks_guard:
+        lock = _root_locks.setdefault(root, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(root, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def forget_workspace_lock(root: str):
+    """Drop the thread lock of a deleted workspace so ``_root_locks`` does not grow without bound."""
+    with _root_locks_guard:
+        _root_locks.pop(root, None)
+
+def _fsync_directory(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _remove_stale_staging(root: str):
+    # Left behind by a crash between staging and commit
+    cutoff = time.time() - STALE_STAGING_SECONDS
+    for entry in os.scandir(root):
+        if entry.name.startswith(STAGING_PREFIX) and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def _take_snapshot(root: str, targets: list, staging: str, extend: bool = False):
+    """Hard-link the current versions of ``targets`` into a new snapshot and swap it in for the old one.
+
+    With ``extend`` they are added to the existing snapshot instead, so that it
+    keeps the state from before the first of several transactions; files it
+    already covers keep their earlier version.
+    """
+    previous = os.path.join(root, SNAPSHOT_DIR)
+    manifest_path = os.path.join(previous, "manifest.json")
+    if extend and os.path.isfile(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        snapshot = previous
+    else:
+        extend = False
+        manifest = {"created_at": time.time(), "replaced": [], "created": []}
+        snapshot = os.path.join(staging, SNAPSHOT_DIR)
+    covered = set(manifest["replaced"]) | set(manifest["created"])
+    for target in targets:
+        relative = os.path.relpath(target, root)
+        if relative in covered:
+            continue
+        if not os.path.isfile(target):
+            manifest["created"].append(relative)
+            continue
+        saved = os.path.join(snapshot, "files", relative)
+        os.makedirs(os.path.dirname(saved), exist_ok=True)
+        try:
+            os.link(target, saved)  # Writes replace files instead of modifying them, so the inode stays intact
+        except OSError:
+            shutil.copy2(target, saved)
+        manifest["replaced"].append(relative)
+    os.makedirs(snapshot, exist_ok=True)
+    # Written beside the snapshot and renamed in, so an extended snapshot never has a torn manifest
+    staged_manifest = os.path.join(staging, "manifest.json")
+    with open(staged_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(staged_manifest, os.path.join(snapshot, "manifest.json"))
+    if extend:
+        return
+    if os.path.isdir(previous):
+        # Moved into the staging directory so it is deleted with it
+        os.replace(previous, os.path.join(staging, "previous-snapshot"))
+    os.replace(snapshot, previous)
+
+def write_files_atomic(root: str, files: dict, fsync: bool = False, snapshot: bool = True, remove=(),
+                       extend_snapshot: bool = False):
+    """Write ``{absolute path: content}`` under workspace ``root`` as one transaction.
+
+    Every file is staged in a temporary directory on the same filesystem first,
+    then renamed over its target, so a reader of one file sees either its old or
+    its new content; the renames happen one by one, so a reader of several
+    files may see some already replaced. Content may be ``str`` or
+    ``bytes``; paths in ``remove`` are deleted in the same transaction. Unless
+    ``snapshot`` is False the replaced and removed versions are kept (as hard
+    links) for ``rollback_snapshot``; ``extend_snapshot`` adds them to the
+    previous transaction's snapshot, so one rollback undoes a series of writes
+    (as a streamed generation makes). With ``fsync`` the staged files are
+    flushed to disk in one batch before the renames, and the touched
+    directories once after them.
+    """
+    for path in list(files) + list(remove):
+        if not os.path.normpath(path).startswith(os.path.normpath(root) + os.sep):
+            raise ValueError(f"Invalid file path: {path}")
+    with workspace_write_lock(root):
+        _remove_stale_staging(root)
+        staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=root)
+        try:
+            staged = []
+            for index, (path, content) in enumerate(files.items()):
+                staged_path = os.path.join(staging, str(index))
+                with open(staged_path, "wb") as f:
+                    f.write(content if isinstance(content, bytes) else content.encode("utf-8"))
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                staged.append((staged_path, path))
+            if snapshot:
+                _take_snapshot(
+                    root, list(files) + [path for path in remove if path not in files], staging, extend_snapshot
+                )
+
+            committed = []
+            try:
+                for staged_path, path in staged:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(staged_path, path)
+                    committed.append(path)
+                for path in remove:
+                    if path not in files and os.path.isfile(path):
+                        os.remove(path)
+                        committed.append(path)
+            except Exception:
+                if snapshot and committed:
+                    logger.error(f"Commit to {root} failed after {len(committed)} files, rolling back")
+                    _restore_snapshot(root)
+                raise
+            if fsync:
+                for directory in {os.path.dirname(path) for path in list(files) + list(remove)}:
+                    _fsync_directory(directory)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"Committed {len(files)} files to {root}" + (f", removed {len(remove)}" if remove else ""))
+
+def _restore_snapshot(root: str):
+    # Caller holds the workspace write lock
+    snapshot = os.path.join(root, SNAPSHOT_DIR)
+    manifest_path = os.path.join(snapshot, "manifest.json")
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    restored, removed = [], []
+    for relative in manifest["replaced"]:
+        target = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(snapshot, "files", relative), target)
+        restored.append(target)
+    for relative in manifest["created"]:
+        target = os.path.join(root, relative)
+        if os.path.isfile(target):
+            os.remove(target)
+            removed.append(target)
+    shutil.rmtree(snapshot, ignore_errors=True)
+    return restored, removed
+
+def rollback_snapshot(root: str):
+    """Undo the last transaction under ``root``; returns ``(restored paths, removed paths)`` or None if there is no snapshot."""
+    with workspace_write_lock(root):
+        return _restore_snapshot(root)
+
+def get_file_io_executor() -> ThreadPoolExecutor:
+    global _file_io_executor
+    if _file_io_executor is None:
+        _file_io_executor = ThreadPoolExecutor(max_workers=FILE_IO_THREADS, thread_name_prefix="file-io")
+    return _file_io_executor
+
+def shutdown_file_io_executor():
+    global _file_io_executor
+    if _file_io_executor is not None:
+        _file_io_executor.shutdown(wait=True)
+        _file_io_executor = None
+
+async def run_file_io(func, *args, **kwargs):
+    """Run a blocking filesystem call on the bounded file I/O thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_file_io_executor(), partial(func, *args, **kwargs))
+
+async def get_file_content_async(directory: str, filename: str) -> str:
+    return await run_file_io(get_file_content, directory, filename)
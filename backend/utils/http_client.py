@@ -0,0 +1,110 @@
+import logging
+import httpx
+from utils.config import env_int, env_float, env_bool
+
+logger = logging.getLogger(__name__)
+
+def get_http_client_settings() -> dict:
+    """Read connection-pool and timeout settings for the LLM client from the environment."""
+    return {
+        "max_connections": env_int("LLM_HTTP_MAX_CONNECTIONS", 50),
+        "max_keepalive_connections": env_int("LLM_HTTP_MAX_KEEPALIVE", 20),
+        "keepalive_expiry": env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 30.0),
+        "http2": env_bool("LLM_HTTP2", False),
+        "connect_timeout": env_float("LLM_HTTP_CONNECT_TIMEOUT", 10.0),
+        "read_timeout": env_float("LLM_HTTP_READ_TIMEOUT", 120.0),
+        "write_timeout": env_float("LLM_HTTP_WRITE_TIMEOUT", 30.0),
+        "pool_timeout": env_float("LLM_HTTP_POOL_TIMEOUT", 30.0),
+    }
+
+class PoolCounters:
+    """Request counters kept alongside the pooled client for utilization reporting."""
+
+    def __init__(self):
+        self.requests_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.errors_total = 0
+
+    def request_started(self):
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def request_finished(self, failed: bool = False):
+        self.in_flight -= 1
+        if failed:
+            self.errors_total += 1
+
+def create_http_client(settings: dict = None) -> httpx.AsyncClient:
+    """Create the app-lifetime AsyncClient used for all outbound LLM calls."""
+    settings = settings or get_http_client_settings()
+    limits = httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=settings["write_timeout"],
+        pool=settings["pool_timeout"],
+    )
+    http2 = settings["http2"]
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("LLM_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    client = httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+    client.pool_settings = dict(settings, http2=http2)
+    client.pool_counters = PoolCounters()
+    logger.info(
+        f"Created pooled HTTP client (max_connections={settings['max_connections']}, "
+        f"max_keepalive={settings['max_keepalive_connections']}, http2={http2})"
+    )
+    return client
+
+def get_pool_stats(client: httpx.AsyncClient) -> dict:
+    """Return a snapshot of connection-pool utilization for the given client."""
+    settings = getattr(client, "pool_settings", {})
+    counters = getattr(client, "pool_counters", None)
+    stats = {
+        "max_connections": settings.get("max_connections"),
+        "max_keepalive_connections": settings.get("max_keepalive_connections"),
+        "http2": settings.get("http2", False),
+        "connections": 0,
+        "idle_connections": 0,
+        "active_connections": 0,
+        "http2_connections": 0,
+        "pending_requests": 0,
+    }
+
+    # httpcore does not expose pool state publicly, so read it defensively.
+    pool = getattr(client, "_transport", None)
+    pool = getattr(pool, "_pool", None)
+    if pool is not None:
+        connections = list(getattr(pool, "connections", []))
+        stats["connections"] = len(connections)
+        for connection in connections:
+            if connection.is_idle():
+                stats["idle_connections"] += 1
+            else:
+                stats["active_connections"] += 1
+            if "HTTP/2" in repr(connection):
+                stats["http2_connections"] += 1
+        requests = getattr(pool, "_requests", [])
+        stats["pending_requests"] = sum(1 for status in requests if status.connection is None)
+
+    if stats["max_connections"]:
+        stats["utilization"] = round(stats["active_connections"] / stats["max_connections"], 3)
+    if counters is not None:
+        stats.update({
+            "requests_total": counters.requests_total,
+            "in_flight": counters.in_flight,
+            "peak_in_flight": counters.peak_in_flight,
+            "errors_total": counters.errors_total,
+        })
+    return stats
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from utils.config import env_int, env_float
+from utils.file_utils import run_file_io
+
+logger = logging.getLogger(__name__)
+
+class JobFailed(Exception):
+    """Raised by job handlers for a final failure; ``status_code`` is reported with the error."""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+class JobStore:
+    """SQLite-backed job records and progress events.
+
+    Workers claim jobs with a lease that they keep renewing; a job whose lease
+    ran out belongs to a crashed worker (in this or another process) and is
+    claimed again. WAL mode lets several server processes share the file.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, status_code INTEGER, attempts INTEGER NOT NULL DEFAULT 0, "
+            "lease_until REAL, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, at REAL NOT NULL, event TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, seq)")
+        self._lock = threading.Lock()
+        logger.info(f"Job store at {db_path}")
+
+    def add_event(self, job_id: str, event: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO job_events (job_id, at, event) VALUES (?, ?, ?)", (job_id, time.time(), json.dumps(event))
+            )
+
+    def create(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), time.time()),
+            )
+        self.add_event(job_id, {"type": "queued"})
+        return job_id
+
+    def claim(self):
+        """Atomically take the oldest queued (or abandoned) job; returns ``(id, kind, payload, attempt)`` or None."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        "SELECT id, kind, payload, attempts FROM jobs "
+                        "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (now,),
+                    ).fetchone()
+                    if row is None:
+                        self._db.execute("COMMIT")
+                        return None
+                    job_id, kind, payload, attempts = row
+                    if attempts >= self.max_attempts:
+                        # Crashed every worker that tried it; stop retrying
+                        self._db.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, status_code = 500, finished_at = ? WHERE id = ?",
+                            (f"Abandoned after {attempts} interrupted attempts", now, job_id),
+                        )
+                        continue
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                        "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                        (now + self.lease_seconds, now, job_id),
+                    )
+                    self._db.execute("COMMIT")
+                    return job_id, kind, json.loads(payload), attempts + 1
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def renew(self, job_id: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id),
+            )
+
+    def release(self, job_id: str):
+        """Put a job back in the queue (e.g. on shutdown) without counting the attempt."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+
+    def finish(self, job_id: str, result: dict = None, error: str = None, status_code: int = None):
+        status = "failed" if error is not None else "succeeded"
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, lease_until = NULL, "
+                "finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, status_code, time.time(), job_id),
+            )
+        self.add_event(job_id, {"type": status, **({"error": error} if error is not None else {})})
+
+    def get(self, job_id: str, after: int = 0):
+        """Return the job with its events after sequence number ``after``, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, payload, result, error, status_code, attempts, created_at, started_at, "
+                "finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            events = self._db.execute(
+                "SELECT seq, at, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        keys = ("id", "kind", "status", "payload", "result", "error", "status_code", "attempts",
+                "created_at", "started_at", "finished_at")
+        job = dict(zip(keys, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["events"] = [dict(json.loads(event), seq=seq, at=at) for seq, at, event in events]
+        return job
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs (and their events) that completed before ``older_than``."""
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (older_than,)
+            )]
+            for job_id in ids:
+                self._db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(ids)
+
+    def ping(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1").fetchone() == (1,)
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class JobQueue:
+    """Pool of asyncio workers running durable jobs from a JobStore.
+
+    Handlers are registered per job kind as ``async handler(payload, progress)``;
+    ``await progress(event)`` records a progress event and the return value is
+    stored as the job result. Concurrency is the worker count, not open sockets.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, poll_interval: float = 1.0, retention_seconds: int = 7 * 24 * 3600):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "resumed": 0, "errors": 0}
+
+    def register(self, kind: str, handler):
+        self._handlers[kind] = handler
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        purged = await run_file_io(self.store.purge, time.time() - self.retention_seconds)
+        if purged:
+            logger.info(f"Purged {purged} finished jobs")
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: dict) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await run_file_io(self.store.create, kind, payload)
+        self.counters["submitted"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass  # Poll anyway: other processes may have queued or abandoned jobs
+        self._wakeup.clear()
+
+    async def _keep_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            await run_file_io(self.store.renew, job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                claimed = await run_file_io(self.store.claim)
+            except Exception as e:
+                logger.error(f"Job worker {index} could not claim a job: {str(e)}")
+                claimed = None
+            if claimed is None:
+                await self._wait_for_work()
+                continue
+            try:
+                await self._run(*claimed)
+            except Exception as e:
+                # E.g. the store stayed locked while recording progress or the outcome. The lease
+                # lapses and the job is resumed later; this worker must not die with it.
+                self.counters["errors"] += 1
+                logger.error(f"Job worker {index} could not run job {claimed[0]}: {str(e)}")
+
+    async def _run(self, job_id: str, kind: str, payload: dict, attempt: int):
+        if attempt > 1:
+            self.counters["resumed"] += 1
+            logger.info(f"Resuming job {job_id} (attempt {attempt})")
+
+        async def progress(event: dict):
+            await run_file_io(self.store.add_event, job_id, event)
+
+        await progress({"type": "started", "attempt": attempt})
+        lease = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise JobFailed(f"Unknown job kind: {kind}")
+            result = await handler(payload, progress)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so the next start picks it up immediately
+            await asyncio.shield(run_file_io(self.store.release, job_id))
+            raise
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            error = getattr(e, "detail", None) or str(e)
+            logger.error(f"Job {job_id} failed: {error}")
+            await run_file_io(self.store.finish, job_id, error=error, status_code=status_code)
+            self.counters["failed"] += 1
+        else:
+            await run_file_io(self.store.finish, job_id, result=result)
+            self.counters["completed"] += 1
+        finally:
+            lease.cancel()
+
+    def stats(self) -> dict:
+        stats = dict(self.counters, workers=self.workers)
+        stats.update({f"jobs_{status}": count for status, count in self.store.counts().items()})
+        return stats
+
+def create_job_queue(default_db_path: str) -> JobQueue:
+    """Build the job store and worker pool from environment settings."""
+    store = JobStore(
+        os.environ.get("JOB_DB") or default_db_path,
+        lease_seconds=env_float("JOB_LEASE_SECONDS", 60.0),
+        max_attempts=env_int("JOB_MAX_ATTEMPTS", 3),
+    )
+    return JobQueue(
+        store,
+        workers=env_int("JOB_WORKERS", 2),
+        poll_interval=env_float("JOB_POLL_INTERVAL", 1.0),
+        retention_seconds=env_int("JOB_RETENTION_SECONDS", 7 * 24 * 3600),
+    )
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from utils.config import env_int, env_bool
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a cache entry.
+
+    Only for free-text ideas: prompts that embed code must be keyed verbatim.
+    """
+    return " ".join(prompt.split()).lower()
+
+def make_cache_key(model: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int,
+                   fold_prompt: bool = False) -> str:
+    """Content-address an LLM request by hashing every field that affects the completion.
+
+    The user prompt is hashed as sent (minus surrounding whitespace) unless
+    ``fold_prompt`` asks for ``normalize_prompt``.
+    """
+    material = json.dumps(
+        [model, system_prompt, normalize_prompt(user_prompt) if fold_prompt else user_prompt.strip(),
+         temperature, max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """Two-tier response cache: an in-memory LRU backed by an optional SQLite store."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: int = 3600, db_path: str = None, max_disk_entries: int = 5000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            # WAL and a busy timeout let several server processes share one file
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._db.commit()
+            logger.info(f"LLM cache disk tier at {db_path}")
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, stored_at: float):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[1])
+        self._memory[key] = (stored_at, value)
+        self._memory_bytes += len(value)
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def _forget(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return value
+                self._forget(key)
+                self.counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, stored_at = row
+                    if not self._expired(stored_at, now):
+                        self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, value, stored_at)
+                        self.counters["hits"] += 1
+                        self.counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.counters["expirations"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                if self.ttl_seconds > 0:
+                    self._db.execute("DELETE FROM llm_cache WHERE stored_at < ?", (now - self.ttl_seconds,))
+                # Drop least recently used rows beyond the disk quota
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return stats
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+def create_llm_cache(default_db_path: str = None):
+    """Build the response cache from environment settings, or None when disabled.
+
+    ``LLM_CACHE_DB`` overrides ``default_db_path``; without either the cache is memory only.
+    """
+    if not env_bool("LLM_CACHE_ENABLED", True):
+        logger.info("LLM response cache disabled")
+        return None
+    return LLMCache(
+        max_entries=env_int("LLM_CACHE_MAX_ENTRIES", 256),
+        max_bytes=env_int("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        ttl_seconds=env_int("LLM_CACHE_TTL", 3600),
+        db_path=os.environ.get("LLM_CACHE_DB") or default_db_path,
+        max_disk_entries=env_int("LLM_CACHE_MAX_DISK_ENTRIES", 5000),
+    )
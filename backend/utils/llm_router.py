@@ -0,0 +1,190 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import NamedTuple
+from utils.config import env_int, env_float, env_bool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER_URL = "https://api.groq.com/openai/v1/chat/completions"
+DEFAULT_MODEL = "qwen/qwen3-32b"  # Valid Groq models: llama-3.3-70b-versatile, llama-3.1-8b-instant, ...
+ROUTE_NAMES = ("generate", "auto_fix")
+
+class Provider(NamedTuple):
+    name: str
+    url: str
+    api_key: str
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+class Target(NamedTuple):
+    provider: Provider
+    model: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider.name}:{self.model}"
+
+class LatencyWindow:
+    """Rolling window of latency samples in seconds."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+class Route:
+    """A named kind of LLM call served by a primary target, with optional alternates for hedging."""
+
+    def __init__(self, name: str, targets: list, window_size: int = 200):
+        self.name = name
+        self.targets = targets
+        self.latency = LatencyWindow(window_size)  # Primary target only; drives the hedge delay
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "errors": 0}
+
+    @property
+    def primary(self) -> Target:
+        return self.targets[0]
+
+class LLMRouter:
+    """Provider/model registry with per-route targets and optional hedged requests.
+
+    With hedging on, a route that has an alternate target and enough latency
+    samples starts a second request to the alternate once the primary has been
+    outstanding for the route's ``hedge_quantile`` latency; the first success
+    wins and the other request is cancelled.
+    """
+
+    def __init__(self, providers: dict, routes: dict, hedge: bool = False, hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 20, hedge_min_delay: float = 0.5):
+        self.providers = providers
+        self.routes = routes
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+    def route(self, name: str) -> Route:
+        return self.routes[name]
+
+    def hedge_delay(self, route: Route):
+        """Seconds to wait for the primary before hedging, or None when the route cannot hedge."""
+        if not self.hedge or len(route.targets) < 2 or len(route.latency) < self.hedge_min_samples:
+            return None
+        return max(route.latency.quantile(self.hedge_quantile), self.hedge_min_delay)
+
+    async def run(self, route: Route, send):
+        """Call ``await send(target)`` for the route and return ``(target, result)``."""
+        route.counters["requests"] += 1
+        started = time.perf_counter()
+        delay = self.hedge_delay(route)
+        primary = asyncio.ensure_future(send(route.primary))
+        tasks = {primary: route.primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    route.counters["hedged"] += 1
+                    alternate = route.targets[1]
+                    logger.info(f"Hedging {route.name} to {alternate.label} after {delay:.2f}s")
+                    tasks[asyncio.ensure_future(send(alternate))] = alternate
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is not primary:
+                        route.counters["hedge_wins"] += 1
+                    if task is primary or not primary.done():
+                        # A primary that lost to the hedge adds a lower bound, keeping slow calls in the window
+                        route.latency.add(time.perf_counter() - started)
+                    return tasks[task], task.result()
+            route.counters["errors"] += 1
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        stats = {"hedge": self.hedge, "providers": sorted(self.providers)}
+        for name, route in self.routes.items():
+            p50 = route.latency.quantile(0.5)
+            p95 = route.latency.quantile(0.95)
+            delay = self.hedge_delay(route)
+            stats[name] = dict(
+                route.counters,
+                targets=[target.label for target in route.targets],
+                samples=len(route.latency),
+                p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+                p95_ms=round(p95 * 1000, 1) if p95 is not None else None,
+                hedge_delay_ms=round(delay * 1000, 1) if delay is not None else None,
+            )
+        return stats
+
+def parse_providers(spec: str) -> dict:
+    """Parse ``name=url,...``; each provider's key is read from ``<NAME>_API_KEY``."""
+    providers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, url = item.partition("=")
+        if not sep or not name or not url:
+            raise ValueError(f"Invalid provider entry (expected name=url): {item}")
+        providers[name] = Provider(name, url, os.environ.get(f"{name.upper()}_API_KEY"))
+    return providers
+
+def parse_targets(spec: str, providers: dict) -> list:
+    """Parse ``provider:model,...`` (primary first); a bare model uses the first provider."""
+    targets = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, model = item.partition(":")
+        if not sep:
+            name, model = next(iter(providers)), item
+        if name not in providers:
+            raise ValueError(f"Unknown LLM provider in route: {name}")
+        targets.append(Target(providers[name], model))
+    return targets
+
+def create_llm_router() -> LLMRouter:
+    """Build the router from environment settings.
+
+    ``LLM_PROVIDERS`` lists providers (default: Groq at ``GROQ_API_URL``) and
+    ``LLM_ROUTE_<NAME>`` the targets per route; unset routes use ``LLM_ROUTE_DEFAULT``
+    but still keep their own latency stats.
+    """
+    providers = parse_providers(
+        os.environ.get("LLM_PROVIDERS") or f"groq={os.environ.get('GROQ_API_URL', DEFAULT_PROVIDER_URL)}"
+    )
+    window_size = env_int("LLM_LATENCY_WINDOW", 200)
+    default_spec = os.environ.get("LLM_ROUTE_DEFAULT") or DEFAULT_MODEL
+    routes = {
+        name: Route(name, parse_targets(os.environ.get(f"LLM_ROUTE_{name.upper()}") or default_spec, providers), window_size)
+        for name in ROUTE_NAMES
+    }
+    router = LLMRouter(
+        providers,
+        routes,
+        hedge=env_bool("LLM_HEDGE", False),
+        hedge_quantile=env_float("LLM_HEDGE_QUANTILE", 0.95),
+        hedge_min_samples=env_int("LLM_HEDGE_MIN_SAMPLES", 20),
+        hedge_min_delay=env_float("LLM_HEDGE_MIN_DELAY", 0.5),
+    )
+    logger.info(
+        "LLM routes: " + ", ".join(f"{name}={'|'.join(t.label for t in route.targets)}" for name, route in routes.items())
+    )
+    return router
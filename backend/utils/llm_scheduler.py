@@ -0,0 +1,309 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import sqlite3
+import itertools
+import threading
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import httpx
+from utils.config import env_int, env_float
+from utils.file_utils import run_file_io
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value: str):
+    """Return the delay in seconds from a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Refilling bucket used for both requests-per-minute and tokens-per-minute limits."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Wait until ``amount`` tokens are available; returns the time spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class SharedTokenBucket:
+    """TokenBucket kept in SQLite so every server process draws from the same provider quota.
+
+    Refunds are applied with the next acquire instead of costing a write of their own.
+    """
+
+    def __init__(self, db_path: str, name: str, per_minute: int):
+        self.name = name
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._refunds = 0.0
+        self._lock = asyncio.Lock()
+        self._db_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _level(self, now: float) -> float:
+        # Caller holds the database lock
+        row = self._db.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def _take(self, amount: float) -> float:
+        """Take ``amount`` tokens if the bucket has them; returns 0, or the seconds until it will."""
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                refunds, self._refunds = self._refunds, 0.0
+                tokens = min(self.capacity, self._level(now) + refunds)
+                delay = 0.0 if tokens >= amount else (amount - tokens) / self.rate
+                if not delay:
+                    tokens -= amount
+                self._db.execute(
+                    "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return delay
+
+    @property
+    def tokens(self) -> float:
+        with self._db_lock:
+            return self._level(time.time())
+
+    async def acquire(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                delay = await run_file_io(self._take, amount)
+                if not delay:
+                    return waited
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def refund(self, amount: float):
+        self._refunds += amount
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+class LLMScheduler:
+    """Bound, rate-limit, prioritise, coalesce and retry outbound LLM calls."""
+
+    def __init__(self, max_in_flight: int = 8, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0, rate_limit_db: str = None):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        def bucket(name: str, per_minute: int):
+            if per_minute <= 0:
+                return None
+            return SharedTokenBucket(rate_limit_db, name, per_minute) if rate_limit_db else TokenBucket(per_minute)
+
+        self._request_bucket = bucket("requests", requests_per_minute)
+        self._token_bucket = bucket("tokens", tokens_per_minute)
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._sequence = itertools.count()
+        self._pending = {}
+        self.counters = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "throttle_wait_seconds": 0.0,
+        }
+
+    async def _acquire_slot(self, priority: int):
+        # While slots are free there are no live waiters: releases hand slots to waiters first
+        if self._active < self.max_in_flight:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed to us just before cancellation; pass it on
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # Hand the slot over without decrementing
+                return
+        self._active -= 1
+
+    async def _throttle(self, tokens: int):
+        if self._request_bucket is not None:
+            self.counters["throttle_wait_seconds"] += await self._request_bucket.acquire(1)
+        if self._token_bucket is not None and tokens:
+            self.counters["throttle_wait_seconds"] += await self._token_bucket.acquire(tokens)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_BULK, tokens: int = 0):
+        """Hold an in-flight slot (after rate limiting) for work that cannot be retried, e.g. streams."""
+        await self._acquire_slot(priority)
+        try:
+            await self._throttle(tokens)
+            yield
+        finally:
+            self._release_slot()
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = parse_retry_after(error.response.headers.get("retry-after"))
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, httpx.TransportError)
+
+    async def _run(self, func, priority: int, tokens: int):
+        for attempt in range(self.max_retries + 1):
+            async with self.slot(priority, tokens):
+                try:
+                    result = await func()
+                except Exception as e:
+                    error = e
+                else:
+                    self.counters["completed"] += 1
+                    self._refund_unused_tokens(result, tokens)
+                    return result
+
+            if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+                self.counters["rate_limited"] += 1
+            if attempt == self.max_retries or not self._is_retryable(error):
+                self.counters["failed"] += 1
+                raise error
+            delay = self._retry_delay(attempt, error)
+            self.counters["retries"] += 1
+            logger.warning(f"LLM call failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def _refund_unused_tokens(self, result, reserved: int):
+        if self._token_bucket is None or not isinstance(result, dict):
+            return
+        usage = result.get("usage") or {}
+        used = usage.get("total_tokens")
+        if used is not None and used < reserved:
+            self._token_bucket.refund(reserved - used)
+
+    async def submit(self, func, priority: int = PRIORITY_BULK, tokens: int = 0, key: str = None):
+        """Run ``func`` (an async callable) under the scheduler's limits.
+
+        Calls sharing a ``key`` while one is in flight wait for that call instead of
+        issuing their own upstream request.
+        """
+        self.counters["submitted"] += 1
+        if key is not None and key in self._pending:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self._pending[key])
+
+        task = asyncio.ensure_future(self._run(func, priority, tokens))
+        # Retrieve the outcome even if every waiter was cancelled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if key is not None:
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        stats = dict(self.counters)
+        stats["throttle_wait_seconds"] = round(stats["throttle_wait_seconds"], 3)
+        stats.update({
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._active,
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "coalescing": len(self._pending),
+        })
+        if self._request_bucket is not None:
+            stats["request_tokens_available"] = round(self._request_bucket.tokens, 1)
+        if self._token_bucket is not None:
+            stats["llm_tokens_available"] = round(self._token_bucket.tokens, 1)
+        return stats
+
+    def close(self):
+        for bucket in (self._request_bucket, self._token_bucket):
+            if isinstance(bucket, SharedTokenBucket):
+                bucket.close()
+
+def create_llm_scheduler(default_rate_limit_db: str = None) -> LLMScheduler:
+    """Build the LLM scheduler from environment settings (0 disables a rate limit).
+
+    Rate limits are kept in ``LLM_RATE_LIMIT_DB`` (or ``default_rate_limit_db``)
+    when set, so that all server processes share them; otherwise in memory.
+    """
+    return LLMScheduler(
+        max_in_flight=env_int("LLM_MAX_IN_FLIGHT", 8),
+        requests_per_minute=env_int("LLM_REQUESTS_PER_MINUTE", 0),
+        tokens_per_minute=env_int("LLM_TOKENS_PER_MINUTE", 0),
+        max_retries=env_int("LLM_MAX_RETRIES", 3),
+        base_delay=env_float("LLM_RETRY_BASE_DELAY", 0.5),
+        max_delay=env_float("LLM_RETRY_MAX_DELAY", 30.0),
+        rate_limit_db=os.environ.get("LLM_RATE_LIMIT_DB") or default_rate_limit_db,
+    )
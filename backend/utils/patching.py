@@ -0,0 +1,157 @@
+import re
+import os
+import logging
+from typing import NamedTuple
+from utils.code_parser import iter_code_blocks
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# "App.js:12:5", "(src/App.js:12)", "App.js line 12"
+STACK_LOCATION_PATTERN = re.compile(r"([\w./\\-]+\.\w+)(?::|\s+line\s+)(\d+)")
+# Excerpt line-number prefixes that models sometimes copy into their diffs
+NUMBERED_LINE_PATTERN = re.compile(r"^\s*\d+\| ?")
+IMPORT_LINE_PATTERN = re.compile(r"^\s*(import\b|from\s+\S+\s+import\b|export\s+\*\s+from\b|.*\brequire\(|['\"]use )")
+
+class PatchError(Exception):
+    """Raised when a diff cannot be parsed or does not apply to the file."""
+
+class Hunk(NamedTuple):
+    old_start: int  # 1-based, as in the hunk header
+    old_lines: list  # Context and removed lines
+    new_lines: list  # Context and added lines
+
+def stack_trace_lines(stack_trace: str, filename: str) -> list:
+    """Return the sorted line numbers the stack trace reports for ``filename``."""
+    basename = os.path.basename(filename)
+    lines = set()
+    for path, line in STACK_LOCATION_PATTERN.findall(stack_trace or ""):
+        if os.path.basename(path.replace("\\", "/")) == basename:
+            lines.add(int(line))
+    return sorted(lines)
+
+def build_context_excerpt(content: str, line_numbers: list, radius: int = 20, max_header_lines: int = 40):
+    """Cut ``content`` down to its import header plus ``radius`` lines around each reported line.
+
+    Lines are prefixed with their 1-based number so the model can write accurate
+    hunk headers; gaps are marked with ``...``. Returns ``(excerpt, lines shown)``.
+    Without line numbers the whole file is returned.
+    """
+    lines = content.splitlines()
+    if not line_numbers:
+        ranges = [(1, len(lines))]
+    else:
+        ranges = []
+        header_end = 0
+        for index, line in enumerate(lines[:max_header_lines]):
+            if IMPORT_LINE_PATTERN.match(line):
+                header_end = index + 1
+        if header_end:
+            ranges.append((1, header_end))
+        for number in line_numbers:
+            if 1 <= number <= len(lines):
+                ranges.append((max(1, number - radius), min(len(lines), number + radius)))
+        if len(ranges) == (1 if header_end else 0):
+            ranges = [(1, len(lines))]  # Reported lines are outside the file; send all of it
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    width = len(str(len(lines)))
+    parts = []
+    shown = 0
+    for start, end in merged:
+        if start > 1:
+            parts.append("...")
+        parts.extend(f"{number:>{width}}| {lines[number - 1]}" for number in range(start, end + 1))
+        shown += end - start + 1
+    if merged and merged[-1][1] < len(lines):
+        parts.append("...")
+    return "\n".join(parts), shown
+
+def extract_diff(text: str) -> str:
+    """Return the diff from a completion, unwrapping a ```diff fenced block if there is one."""
+    for block in iter_code_blocks(text):
+        body = block.code(text)
+        if "@@" in body:
+            return body
+    return text.strip()
+
+def parse_unified_diff(text: str) -> list:
+    """Parse the hunks of a unified diff; file headers and unknown lines outside hunks are ignored."""
+    hunks = []
+    current = None
+    for line in extract_diff(text).splitlines():
+        header = HUNK_HEADER_PATTERN.match(line)
+        if header:
+            current = Hunk(int(header.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None or line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        if line.startswith("-"):
+            current.old_lines.append(line[1:])
+        elif line.startswith("+"):
+            current.new_lines.append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current.old_lines.append(line[1:])
+            current.new_lines.append(line[1:])
+        else:
+            current = None  # Prose after the diff
+    hunks = [_strip_line_numbers(hunk) for hunk in hunks if hunk.old_lines != hunk.new_lines]
+    if not hunks:
+        raise PatchError("No hunks with changes found in the diff")
+    return hunks
+
+def _strip_line_numbers(hunk: Hunk) -> Hunk:
+    body = [line for line in hunk.old_lines + hunk.new_lines if line]
+    if not body or not all(NUMBERED_LINE_PATTERN.match(line) for line in body):
+        return hunk
+    strip = lambda lines: [NUMBERED_LINE_PATTERN.sub("", line, count=1) for line in lines]
+    return Hunk(hunk.old_start, strip(hunk.old_lines), strip(hunk.new_lines))
+
+def _find_hunk(lines: list, old_lines: list, expected: int, lowest: int):
+    """Locate ``old_lines`` at or after ``lowest``, preferring the position closest to ``expected``."""
+    span = len(old_lines)
+    candidates = range(lowest, len(lines) - span + 1)
+    for normalize in (lambda line: line, lambda line: line.strip()):
+        target = [normalize(line) for line in old_lines]
+        matches = [
+            start for start in candidates
+            if normalize(lines[start]) == target[0] and [normalize(line) for line in lines[start:start + span]] == target
+        ]
+        if matches:
+            return min(matches, key=lambda start: abs(start - expected))
+    return None
+
+def apply_unified_diff(content: str, diff: str) -> str:
+    """Apply a unified diff to ``content`` and return the patched text.
+
+    Hunks are matched on their context and removed lines, starting at the header
+    position and searching the rest of the file (like ``patch``'s offset
+    handling), first exactly and then ignoring surrounding whitespace.
+    """
+    hunks = parse_unified_diff(diff)
+    lines = content.splitlines()
+    result = []
+    cursor = 0
+    for number, hunk in enumerate(hunks, 1):
+        if not hunk.old_lines:
+            # Pure insertion: trust the header position
+            start = min(max(hunk.old_start, cursor), len(lines))
+        else:
+            start = _find_hunk(lines, hunk.old_lines, hunk.old_start - 1, cursor)
+            if start is None:
+                raise PatchError(f"Hunk {number} (line {hunk.old_start}) does not match the file")
+        result.extend(lines[cursor:start])
+        result.extend(hunk.new_lines)
+        cursor = start + len(hunk.old_lines)
+    result.extend(lines[cursor:])
+    patched = "\n".join(result)
+    if content.endswith("\n"):
+        patched += "\n"
+    return patched
@@ -0,0 +1,218 @@
+import re
+import math
+import posixpath
+from string import Formatter
+from utils.config import env_int, env_float
+
+# Pre-tokenizer in the style of BPE vocabularies: a leading space joins the next
+# word, long words split into several pieces, digits group by three and
+# punctuation pairs up. It needs no vocabulary file and errs on the high side
+# of real BPE counts (~3-4 characters per token on code and English).
+TOKEN_PATTERN = re.compile(r" ?[A-Za-z]{1,7}| ?\d{1,3}| ?[^\sA-Za-z\d]{1,2}|\n+|[^\S\n]+")
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens the model will see for ``text``."""
+    if not text:
+        return 0
+    count = 0
+    for _ in TOKEN_PATTERN.finditer(text):
+        count += 1
+    return count
+
+class PromptTemplate:
+    """A prompt compiled once: ``{name}`` fields are located up front and the literal text is counted only once.
+
+    Literal braces are written doubled, as with ``str.format``.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts = []
+        fields = []
+        for literal, field, _, _ in Formatter().parse(template):
+            if literal:
+                self._parts.append((literal, None))
+            if field is not None:
+                self._parts.append((None, field))
+                fields.append(field)
+        self.fields = tuple(fields)
+        self.text = "".join(literal for literal, _ in self._parts if literal is not None)
+        self.tokens = count_tokens(self.text)
+
+    def render(self, **values) -> str:
+        return "".join(literal if literal is not None else str(values[field]) for literal, field in self._parts)
+
+# === Prompts (compiled at import) ===
+GENERATION_SYSTEM_PROMPT = PromptTemplate(
+    "You are an expert fullstack developer. Generate an application according to user preference "
+    "based on the user's idea. Your response must be in two parts:\n\n"
+    "PART 1 - TEXT RESPONSE:\n"
+    "First, provide a text response that includes:\n"
+    "1. A brief summary of the user's idea\n"
+    "2. A friendly message about the generated application\n"
+    "3. Suggestions for customization\n"
+    "Format this as a single text block without any code blocks.\n\n"
+
+    "PART 2 - CODE FILES:\n"
+    "Then, provide all the required code files in markdown blocks. Required files (with exact paths):\n"
+    "1. public/index.html\n"
+    "2. src/App.js\n"
+    "3. src/index.js\n"
+    "4. src/App.css\n"
+    "5. src/index.css\n"
+    "6. src/server.js\n"
+
+    "Format each file like this:\n"
+    "```public/index.html\ncode content\n```\n"
+    "```src/App.js\ncode content\n```\n\n"
+
+    "Important:\n"
+    "- Each file must be in its own code block\n"
+    "- Use EXACT filenames with paths as shown above\n"
+    "- Include ALL required files\n"
+    "- Make sure the code is complete and runnable\n"
+    "- The paths must match exactly: public/index.html, src/App.js, etc.\n"
+    "- If you miss any required files, the generation will fail\n"
+    "- Double-check that you've included all required files before responding\n\n"
+
+    "Data Handling:\n"
+    "- For applications that would normally require external APIs, use simulated data instead:\n"
+    "  1. Weather App: Use a weatherData array with 5-7 days of simulated weather data\n"
+    "  2. Maps App: Use a locations array with 5-7 predefined locations\n"
+    "  3. E-commerce: Use a products array with 5-7 sample products\n"
+    "  4. Social Media: Use a posts array with 5-7 sample posts\n"
+    "  5. News App: Use a newsData array with 5-7 sample news articles\n"
+    "- Include a comment in the code indicating this is simulated data\n"
+    "- Add a note in the UI that this is using simulated data\n"
+    "- Make the simulated data realistic and varied\n"
+    "- Include all necessary fields that would be present in real API responses\n"
+    "- Structure the data to match typical API response formats\n"
+    "- Add comments explaining how to replace with real API data\n\n"
+
+    "Styling Requirements:\n"
+    "- Add modern, responsive styles in src/index.css\n"
+    "- Use CSS variables for consistent theming\n"
+    "- Include styles for common elements (buttons, inputs, containers)\n"
+    "- Add responsive design with media queries\n"
+    "- Use flexbox or grid for layouts\n"
+    "- Include hover and focus states for interactive elements\n"
+    "- Add smooth transitions and animations using only advanced CSS (e.g., transform, opacity, scale, keyframes)\n"
+    "- Use CSS keyframe animations and transition properties for interactive effects (e.g., fade-in, slide-up, scale on hover)\n"
+    "- Ensure styles are scoped to prevent conflicts\n"
+    "- Use CSS modules or styled-components for scoped styles\n"
+    "- Ensure styles are modular and reusable\n"
+    "- Make sure App.js imports and uses the styles correctly\n\n"
+
+    "Text Response Template:\n"
+    "Use this format for the text response (PART 1):\n"
+    "'I understand you want to create [brief description of the app]. I've generated a [type of app] application that includes [key features].\n\n"
+    "The application is now ready for you to explore! Feel free to make any adjustments to better match your vision. You can:\n"
+    "- Modify the simulated data to test different scenarios\n"
+    "- Customize the UI styling to match your preferences\n"
+    "- Add new features or modify existing ones\n"
+    "- Adjust the layout or functionality as needed\n\n"
+    "Let me know if you'd like to make any specific changes or have questions about the implementation!'"
+)
+
+COMPLETION_SYSTEM_PROMPT = PromptTemplate(
+    "You are an expert fullstack developer completing a partially generated application. "
+    "Some of the application's files already exist and are given to you as context. "
+    "Generate ONLY the files you are asked for, consistent with the existing files "
+    "(matching imports, component names, class names and API routes).\n\n"
+    "Format each file in its own markdown block with the EXACT path as the info string, like this:\n"
+    "```src/index.css\ncode content\n```\n\n"
+    "Do not repeat the existing files and do not add any explanation outside the code blocks."
+)
+
+AUTO_FIX_SYSTEM_PROMPT = PromptTemplate(
+    "You are an expert fullstack developer and code fixer. Given the following error message, stack trace, and code, suggest a patch or fixed code to resolve the error. "
+    "Return ONLY the fixed code, or a unified diff if appropriate. Do not include explanations."
+)
+
+AUTO_FIX_PATCH_SYSTEM_PROMPT = PromptTemplate(
+    "You are an expert fullstack developer and code fixer. Given an error message, stack trace and an excerpt "
+    "of the failing file, fix the error. Excerpt lines are prefixed with their line number and \"...\" marks "
+    "omitted lines. Respond with ONLY a unified diff of the file: hunk headers like \"@@ -12,3 +12,4 @@\" using "
+    "the original line numbers, three lines of unchanged context around each change, and no line-number "
+    "prefixes on diff lines. Only change lines shown in the excerpt. Do not include explanations."
+)
+
+COMPLETION_PROMPT = PromptTemplate(
+    "Application idea: {idea}\n\n"
+    "Existing files:\n{context}\n\n"
+    "Generate these missing files: {missing}"
+)
+
+# Appended to the original idea (not to the previous retry prompt) in "full" retry mode
+RETRY_NOTE = PromptTemplate(
+    "\n\nIMPORTANT: Your last response was missing these required files: {missing}. "
+    "Please regenerate and include ALL of these files. Each file must be in its own code block with the EXACT filename and path. "
+    "For example:\n"
+    "```src/index.css\n/* Your CSS code here */\n```\n"
+    "Make sure to include ALL missing files in your response."
+)
+
+AUTO_FIX_PROMPT = PromptTemplate(
+    "Error: {error_message}\n"
+    "Stack trace: {stack_trace}\n"
+    "Filename: {filename}\n"
+    "Code:\n{code}\n"
+)
+
+AUTO_FIX_PATCH_PROMPT = PromptTemplate(
+    "Error: {error_message}\n"
+    "Stack trace: {stack_trace}\n"
+    "Filename: {filename}\n"
+    "Code excerpt:\n{excerpt}\n"
+)
+
+# Typical completion size per generated file, by extension
+FILE_TOKEN_ESTIMATES = {".js": 1500, ".jsx": 1500, ".ts": 1500, ".tsx": 1500, ".py": 1500,
+                        ".css": 1000, ".html": 500, ".json": 300, ".md": 400}
+DEFAULT_FILE_TOKENS = 800
+# Per-block fence overhead plus the short text part of a generation
+FENCE_TOKENS = 10
+
+class TokenBudget:
+    """Split a model's context window between prompt and completion.
+
+    ``plan`` sizes ``max_tokens`` from the expected output (with headroom) and
+    caps it by what the context window has left after the prompt.
+    """
+
+    def __init__(self, context_window: int = 131072, max_output_tokens: int = 32768, min_output_tokens: int = 512,
+                 headroom: float = 1.5, margin: float = 0.1):
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.min_output_tokens = min_output_tokens
+        self.headroom = headroom
+        self.margin = margin  # Safety factor for the tokenizer estimate
+
+    def expected_file_tokens(self, filenames, text_tokens: int = 0) -> int:
+        total = text_tokens
+        for filename in filenames:
+            extension = posixpath.splitext(filename)[1].lower()
+            total += FILE_TOKEN_ESTIMATES.get(extension, DEFAULT_FILE_TOKENS) + FENCE_TOKENS
+        return total
+
+    def plan(self, input_tokens: int, expected_output_tokens: int) -> dict:
+        """Return the budget for one request; ``max_tokens`` is 0 when the prompt leaves no room."""
+        input_estimate = math.ceil(input_tokens * (1 + self.margin))
+        available = max(self.context_window - input_estimate, 0)
+        wanted = max(math.ceil(expected_output_tokens * self.headroom), self.min_output_tokens)
+        max_tokens = min(wanted, self.max_output_tokens, available)
+        return {
+            "input_tokens": input_tokens,
+            "expected_output_tokens": expected_output_tokens,
+            "max_tokens": max_tokens,
+            "context_window": self.context_window,
+            "limited_by_context": available < min(wanted, self.max_output_tokens),
+        }
+
+def create_token_budget() -> TokenBudget:
+    return TokenBudget(
+        context_window=env_int("LLM_CONTEXT_WINDOW", 131072),
+        max_output_tokens=env_int("LLM_MAX_OUTPUT_TOKENS", 32768),
+        min_output_tokens=env_int("LLM_MIN_OUTPUT_TOKENS", 512),
+        headroom=env_float("LLM_OUTPUT_HEADROOM", 1.5),
+    )
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import difflib
+import hashlib
+import logging
+import tempfile
+import threading
+from utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+class MissingBlobError(Exception):
+    """Raised when a version references a blob that is no longer in the store."""
+
+def unified_diff(old_text: str, new_text: str, fromfile: str, tofile: str, context: int = 3) -> str:
+    """Unified diff of two texts, marking a last line without a newline like ``diff -u`` does."""
+    lines = []
+    for line in difflib.unified_diff(old_text.splitlines(True), new_text.splitlines(True), fromfile, tofile, n=context):
+        if line.endswith("\n"):
+            lines.append(line)
+        else:
+            lines.append(line + "\n\\ No newline at end of file\n")
+    return "".join(lines)
+
+class VersionStore:
+    """Content-addressed history of workspace files, laid out like a tiny git object store.
+
+    ``objects/ab/cdef...`` holds each distinct file body once, zlib-compressed
+    and named by the SHA-256 of the raw bytes (the hash the file index already
+    keeps). ``versions/<workspace>/<n>.json`` manifests map file names to blob
+    hashes, so a version costs one small JSON file plus the blobs that changed.
+    """
+
+    def __init__(self, base_dir: str, max_versions: int = 50, gc_grace_seconds: int = 3600, compress_level: int = 6):
+        self.objects_dir = os.path.join(base_dir, "objects")
+        self.versions_dir = os.path.join(base_dir, "versions")
+        self.max_versions = max_versions
+        self.gc_grace_seconds = gc_grace_seconds
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        # Running totals, so stats() does not walk the store; gc() recounts them from disk
+        self.blobs = 0
+        self.blob_bytes = 0
+        self.counters = {"versions": 0, "blobs_written": 0, "blob_bytes_written": 0, "dedup_hits": 0,
+                         "gc_runs": 0, "blobs_collected": 0, "bytes_collected": 0}
+
+    def load(self):
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        blobs = blob_bytes = 0
+        for prefix in os.scandir(self.objects_dir):
+            if prefix.is_dir():
+                for blob in os.scandir(prefix.path):
+                    blobs += 1
+                    blob_bytes += blob.stat().st_size
+        self.blobs, self.blob_bytes = blobs, blob_bytes
+
+    def _blob_path(self, blob_hash: str) -> str:
+        return os.path.join(self.objects_dir, blob_hash[:2], blob_hash[2:])
+
+    def _workspace_dir(self, workspace_id: str) -> str:
+        return os.path.join(self.versions_dir, workspace_id)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        # Same-directory temp file + rename: concurrent writers of the same blob race harmlessly
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _reuse_blob(self, blob_hash: str) -> bool:
+        """Touch an existing blob so the GC grace period covers its new reference; False if it is missing."""
+        try:
+            os.utime(self._blob_path(blob_hash))
+        except FileNotFoundError:
+            return False
+        self.counters["dedup_hits"] += 1
+        return True
+
+    def put_blob(self, data: bytes) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob_hash)
+        if self._reuse_blob(blob_hash):
+            return blob_hash
+        compressed = zlib.compress(data, self.compress_level)
+        self._write_atomic(path, compressed)
+        self.counters["blobs_written"] += 1
+        self.counters["blob_bytes_written"] += len(compressed)
+        self.blobs += 1
+        self.blob_bytes += len(compressed)
+        return blob_hash
+
+    def get_blob(self, blob_hash: str) -> bytes:
+        try:
+            with open(self._blob_path(blob_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise MissingBlobError(blob_hash) from None
+
+    def versions(self, workspace_id: str) -> list:
+        """Return the workspace's version numbers, oldest first."""
+        try:
+            names = os.listdir(self._workspace_dir(workspace_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-len(".json")]) for name in names if name.endswith(".json") and name[0] != ".")
+
+    def get(self, workspace_id: str, version: int):
+        """Return a version's manifest, or None if it does not exist (or was pruned)."""
+        try:
+            with open(os.path.join(self._workspace_dir(workspace_id), f"{version:08d}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def head(self, workspace_id: str):
+        versions = self.versions(workspace_id)
+        return self.get(workspace_id, versions[-1]) if versions else None
+
+    def record(self, workspace_id: str, entries: dict, source: str, restored_from: int = None):
+        """Record ``{name: (path, content hash)}`` as a new version; returns its manifest, or None if nothing changed.
+
+        Only blobs the store does not have yet are read and compressed. Callers
+        serialize writers of a workspace (see ``file_utils.workspace_write_lock``);
+        the store lock keeps this process's GC out until the manifest is written,
+        and reused blobs are touched so another process's GC skips them as well.
+        """
+        with self._lock:
+            return self._record(workspace_id, entries, source, restored_from)
+
+    def _record(self, workspace_id: str, entries: dict, source: str, restored_from: int = None):
+        files = {}
+        for name, (path, content_hash) in sorted(entries.items()):
+            if self._reuse_blob(content_hash):
+                files[name] = content_hash
+                continue
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue  # Removed since it was indexed
+            files[name] = self.put_blob(data)
+
+        head = self.head(workspace_id)
+        if head is not None and head["files"] == files and restored_from is None:
+            return None
+        manifest = {
+            "version": head["version"] + 1 if head is not None else 1,
+            "parent": head["version"] if head is not None else None,
+            "created_at": time.time(),
+            "source": source,
+            "files": files,
+        }
+        if restored_from is not None:
+            manifest["restored_from"] = restored_from
+        directory = self._workspace_dir(workspace_id)
+        self._write_atomic(os.path.join(directory, f"{manifest['version']:08d}.json"), json.dumps(manifest).encode("utf-8"))
+        self.counters["versions"] += 1
+        # Keep history bounded; the blobs of pruned versions go at the next GC
+        for version in self.versions(workspace_id)[:-self.max_versions]:
+            os.remove(os.path.join(directory, f"{version:08d}.json"))
+        return manifest
+
+    def diff(self, workspace_id: str, from_version: int, to_version: int, context: int = 3) -> dict:
+        """Compare two versions file by file, with a unified diff for each changed text file."""
+        old, new = self.get(workspace_id, from_version), self.get(workspace_id, to_version)
+        if old is None or new is None:
+            raise KeyError(from_version if old is None else to_version)
+        files = []
+        for name in sorted(set(old["files"]) | set(new["files"])):
+            old_hash, new_hash = old["files"].get(name), new["files"].get(name)
+            if old_hash == new_hash:
+                continue
+            status = "added" if old_hash is None else "removed" if new_hash is None else "modified"
+            change = {"name": name, "status": status}
+            try:
+                old_text = self.get_blob(old_hash).decode("utf-8") if old_hash else ""
+                new_text = self.get_blob(new_hash).decode("utf-8") if new_hash else ""
+            except UnicodeDecodeError:
+                change["binary"] = True
+            else:
+                change["diff"] = unified_diff(
+                    old_text, new_text,
+                    f"a/{name}" if old_hash else "/dev/null", f"b/{name}" if new_hash else "/dev/null", context,
+                )
+            files.append(change)
+        return {"from": from_version, "to": to_version, "files": files}
+
+    def forget_workspace(self, workspace_id: str):
+        shutil.rmtree(self._workspace_dir(workspace_id), ignore_errors=True)
+
+    def gc(self) -> dict:
+        """Delete blobs no manifest references.
+
+        Blobs younger than ``gc_grace_seconds`` are kept: they may belong to a
+        version whose manifest is being written right now.
+        """
+        with self._lock:
+            referenced = set()
+            for workspace in os.scandir(self.versions_dir):
+                if not workspace.is_dir():
+                    continue
+                for manifest in os.scandir(workspace.path):
+                    if not manifest.name.endswith(".json") or manifest.name[0] == ".":
+                        continue
+                    try:
+                        with open(manifest.path, encoding="utf-8") as f:
+                            referenced.update(json.load(f)["files"].values())
+                    except (OSError, ValueError):
+                        continue  # Pruned or being replaced while we read
+            cutoff = time.time() - self.gc_grace_seconds
+            removed = freed = 0
+            # The walk also recounts the totals, picking up blobs other processes wrote
+            blobs = blob_bytes = 0
+            for prefix in os.scandir(self.objects_dir):
+                if not prefix.is_dir():
+                    continue
+                for blob in os.scandir(prefix.path):
+                    try:
+                        if prefix.name + blob.name in referenced:
+                            blobs += 1
+                            blob_bytes += blob.stat().st_size
+                            continue
+                        # Fresh stat: a record in another process may have just touched it
+                        stat = os.stat(blob.path)
+                        if stat.st_mtime > cutoff:
+                            blobs += 1
+                            blob_bytes += stat.st_size
+                            continue
+                        os.remove(blob.path)
+                    except OSError:
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+            self.blobs, self.blob_bytes = blobs, blob_bytes
+            self.counters["gc_runs"] += 1
+            self.counters["blobs_collected"] += removed
+            self.counters["bytes_collected"] += freed
+        if removed:
+            logger.info(f"Version store GC removed {removed} blobs ({freed} bytes)")
+        return {"blobs_removed": removed, "bytes_freed": freed}
+
+    def stats(self) -> dict:
+        return dict(self.counters, blobs=self.blobs, blob_bytes=self.blob_bytes, max_versions=self.max_versions)
+
+def create_version_store(base_dir: str) -> VersionStore:
+    return VersionStore(
+        base_dir,
+        max_versions=env_int("VERSION_MAX_PER_WORKSPACE", 50),
+        gc_grace_seconds=env_int("VERSION_GC_GRACE_SECONDS", 3600),
+        compress_level=env_int("VERSION_COMPRESS_LEVEL", 6),
+    )
@@ -0,0 +1,239 @@
+import os
+import re
+import time
+import shutil
+import logging
+import secrets
+import threading
+from utils.config import env_int
+from utils.file_utils import setup_project_structure
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def new_workspace_id() -> str:
+    """Return a fresh, unguessable workspace ID for a caller that did not name one."""
+    return secrets.token_hex(8)
+
+class WorkspaceNotFoundError(Exception):
+    """Raised when a read names a workspace that does not exist (or was evicted)."""
+
+class WorkspaceQuotaError(Exception):
+    """Raised when a write would push a workspace over its disk quota."""
+
+class Workspace:
+    """An isolated project tree (``src/`` and ``public/``) owned by one session."""
+
+    def __init__(self, workspace_id: str, root: str):
+        self.id = workspace_id
+        self.root = root
+        self.src_dir = os.path.join(root, "src")
+        self.public_dir = os.path.join(root, "public")
+
+    def split_path(self, name: str, for_write: bool = False):
+        """Map a client file name to (directory, relative path) inside this workspace.
+
+        Returns None when reading a name without a ``src/``/``public/`` prefix that
+        exists in neither directory.
+        """
+        if name.startswith('public/'):
+            directory, relative = self.public_dir, name[len('public/'):]
+        elif name.startswith('src/'):
+            directory, relative = self.src_dir, name[len('src/'):]
+        elif for_write:
+            # If no prefix, try to determine the correct directory
+            directory = self.public_dir if name.endswith('.html') else self.src_dir
+            relative = name
+        else:
+            # If no prefix, try both directories
+            if os.path.exists(os.path.join(self.public_dir, name)):
+                directory = self.public_dir
+            elif os.path.exists(os.path.join(self.src_dir, name)):
+                directory = self.src_dir
+            else:
+                return None
+            relative = name
+
+        filepath = os.path.normpath(os.path.join(directory, relative))
+        if not filepath.startswith(os.path.normpath(directory) + os.sep):
+            raise ValueError(f"Invalid file path: {name}")
+        return directory, relative
+
+    def resolve_path(self, name: str, for_write: bool = False):
+        """Return the absolute path for a client file name, or None if it cannot be found."""
+        location = self.split_path(name, for_write)
+        if location is None:
+            return None
+        return os.path.normpath(os.path.join(*location))
+
+# Seconds between last-access stamps on a workspace directory
+TOUCH_INTERVAL = 60
+
+class WorkspaceManager:
+    """Resolve workspace IDs to directories and keep their disk use bounded.
+
+    Last-access times are also stamped on each workspace directory's mtime, so
+    several server processes sharing ``base_dir`` never evict a workspace that
+    another process is still using.
+    """
+
+    def __init__(self, base_dir: str, quota_bytes: int = 20 * 1024 * 1024, idle_ttl: int = 24 * 3600,
+                 max_workspaces: int = 500, min_idle: int = 300):
+        self.base_dir = base_dir
+        self.quota_bytes = quota_bytes
+        self.idle_ttl = idle_ttl
+        self.max_workspaces = max_workspaces
+        self.min_idle = min_idle
+        self._last_access = {}
+        self._touched = {}
+        self._usage = {}  # Last measured, for stats
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self):
+        """Create the base directory and pick up workspaces left by a previous run or another process."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        with self._lock:
+            for entry in os.scandir(self.base_dir):
+                if entry.is_dir() and WORKSPACE_ID_PATTERN.match(entry.name):
+                    self._last_access.setdefault(entry.name, entry.stat().st_mtime)
+
+    def _touch(self, workspace_id: str, root: str, now: float):
+        # Caller holds the lock
+        if now - self._touched.get(workspace_id, 0.0) < TOUCH_INTERVAL:
+            return
+        try:
+            os.utime(root, (now, now))
+        except OSError:
+            return
+        self._touched[workspace_id] = now
+
+    def resolve(self, workspace_id: str, create: bool = True) -> Workspace:
+        """Return the workspace, creating its directory unless ``create`` is False.
+
+        Without ``create`` a missing workspace raises WorkspaceNotFoundError, so
+        reads never leave directories behind.
+        """
+        if not WORKSPACE_ID_PATTERN.match(workspace_id or ""):
+            raise ValueError(f"Invalid workspace id: {workspace_id}")
+        root = os.path.join(self.base_dir, workspace_id)
+        with self._lock:
+            if not os.path.isdir(root):
+                if not create:
+                    raise WorkspaceNotFoundError(f"Workspace {workspace_id} does not exist")
+                setup_project_structure(root)
+            now = time.time()
+            self._last_access[workspace_id] = now
+            self._touch(workspace_id, root, now)
+        return Workspace(workspace_id, root)
+
+    def usage_bytes(self, workspace: Workspace) -> int:
+        with self._lock:
+            return self._current_usage(workspace)
+
+    def _current_usage(self, workspace: Workspace) -> int:
+        # Caller holds the lock. Measured on disk so writes by other server processes
+        # count too, plus this process's reservations whose write is still in flight
+        usage = _directory_size(workspace.root) + self._pending.get(workspace.id, 0)
+        self._usage[workspace.id] = usage
+        return usage
+
+    def reserve(self, workspace: Workspace, sizes: dict) -> int:
+        """Account for writing ``{filepath: new_size}`` or raise WorkspaceQuotaError.
+
+        Returns the change in bytes; hand it to ``release`` once the write is on
+        disk or has failed.
+        """
+        with self._lock:
+            current = self._current_usage(workspace)
+            delta = sum(size - _file_size(filepath) for filepath, size in sizes.items())
+            if delta > 0 and current + delta > self.quota_bytes:
+                raise WorkspaceQuotaError(
+                    f"Workspace {workspace.id} quota exceeded ({current + delta} > {self.quota_bytes} bytes)"
+                )
+            self._pending[workspace.id] = self._pending.get(workspace.id, 0) + delta
+            self._usage[workspace.id] = current + delta
+            self._last_access[workspace.id] = time.time()
+        return delta
+
+    def release(self, workspace: Workspace, delta: int):
+        """End a reservation: its write is now counted on disk, or did not happen."""
+        with self._lock:
+            pending = self._pending.get(workspace.id, 0) - delta
+            if pending:
+                self._pending[workspace.id] = pending
+            else:
+                self._pending.pop(workspace.id, None)
+
+    def evict_idle(self) -> list:
+        """Delete idle workspaces past their TTL, then least recently used ones over the count limit."""
+        now = time.time()
+        with self._lock:
+            for wid, accessed in list(self._last_access.items()):
+                if now - accessed > self.min_idle:
+                    # Another process may have used it since; the directory mtime says so
+                    try:
+                        self._last_access[wid] = max(accessed, os.stat(os.path.join(self.base_dir, wid)).st_mtime)
+                    except FileNotFoundError:
+                        self._last_access.pop(wid)  # Already evicted by another process
+            by_age = sorted(self._last_access.items(), key=lambda item: item[1])
+            victims = [wid for wid, accessed in by_age if now - accessed > self.idle_ttl]
+            remaining = [(wid, accessed) for wid, accessed in by_age if wid not in victims]
+            overflow = len(remaining) - self.max_workspaces
+            for wid, accessed in remaining:
+                if overflow <= 0:
+                    break
+                if now - accessed > self.min_idle:
+                    victims.append(wid)
+                    overflow -= 1
+            for wid in victims:
+                self._last_access.pop(wid, None)
+                self._touched.pop(wid, None)
+                self._usage.pop(wid, None)
+
+        for wid in victims:
+            shutil.rmtree(os.path.join(self.base_dir, wid), ignore_errors=True)
+            logger.info(f"Evicted idle workspace {wid}")
+        self.evictions += len(victims)
+        return victims
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workspaces": len(self._last_access),
+                "max_workspaces": self.max_workspaces,
+                "quota_bytes": self.quota_bytes,
+                "tracked_usage_bytes": sum(self._usage.values()),
+                "evictions": self.evictions,
+            }
+
+def _file_size(filepath: str) -> int:
+    try:
+        return os.path.getsize(filepath) if os.path.isfile(filepath) else 0
+    except OSError:
+        return 0
+
+def _directory_size(directory: str) -> int:
+    total = 0
+    for root, dirnames, filenames in os.walk(directory):
+        if root == directory:
+            # Staging areas and snapshots (hard links) are not project content
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+def create_workspace_manager(base_dir: str) -> WorkspaceManager:
+    """Build the workspace manager from environment settings."""
+    return WorkspaceManager(
+        base_dir,
+        quota_bytes=env_int("WORKSPACE_QUOTA_BYTES", 20 * 1024 * 1024),
+        idle_ttl=env_int("WORKSPACE_IDLE_TTL", 24 * 3600),
+        max_workspaces=env_int("WORKSPACE_MAX_COUNT", 500),
+        min_idle=env_int("WORKSPACE_MIN_IDLE", 300),
+    )
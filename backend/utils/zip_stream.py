@@ -0,0 +1,157 @@
+import os
+import time
+import zipfile
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+def build_manifest(root_dir: str) -> list:
+    """List ``(archive name, path, size, mtime_ns)`` for every file under ``root_dir``, sorted by name."""
+    manifest = []
+    for root, dirnames, filenames in os.walk(root_dir):
+        if root == root_dir:
+            # Skip the workspace's hidden staging, snapshot and lock entries
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            filenames = [name for name in filenames if not name.startswith(".")]
+        for filename in filenames:
+            filepath = os.path.join(root, filename)
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue  # Removed while walking
+            arcname = os.path.relpath(filepath, root_dir).replace(os.sep, "/")
+            manifest.append((arcname, filepath, stat.st_size, stat.st_mtime_ns))
+    manifest.sort()
+    return manifest
+
+def manifest_hash(manifest: list, compression: str, level: int) -> str:
+    """Hash file names, sizes and mtimes plus the archive options into a cache key."""
+    digest = hashlib.sha256(f"{compression}:{level}".encode())
+    for arcname, _, size, mtime_ns in manifest:
+        digest.update(f"\0{arcname}\0{size}\0{mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects zip output until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip_chunks(manifest: list, compression: str = "deflate", level: int = 6):
+    """Yield a zip archive of the manifest's files chunk by chunk, without a temp file.
+
+    zipfile falls back to data descriptors on unseekable output, so each file can be
+    compressed and emitted as it is read.
+    """
+    compress_type = zipfile.ZIP_STORED if compression == "store" else zipfile.ZIP_DEFLATED
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=compress_type, compresslevel=level) as archive:
+        for arcname, filepath, _, mtime_ns in manifest:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(mtime_ns // 10**9, 315532800))[:6])
+            info.compress_type = compress_type
+            if hasattr(info, "compress_level"):
+                info.compress_level = level
+            else:
+                info._compresslevel = level  # Python < 3.13 has no public attribute
+            info.external_attr = 0o644 << 16
+            try:
+                with open(filepath, "rb") as source, archive.open(info, "w") as target:
+                    while True:
+                        data = source.read(READ_CHUNK_SIZE)
+                        if not data:
+                            break
+                        target.write(data)
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+            except FileNotFoundError:
+                logger.warning(f"Skipping {arcname}: removed while archiving")
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+class ArchiveCache:
+    """Byte-bounded LRU of finished archives keyed by manifest hash."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key: str, data: bytes):
+        if len(data) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def iter_and_cache(chunks, cache: ArchiveCache, key: str):
+    """Pass chunks through while collecting them, caching the archive once complete."""
+    collected = []
+    size = 0
+    for chunk in chunks:
+        if collected is not None:
+            size += len(chunk)
+            if size <= cache.max_entry_bytes:
+                collected.append(chunk)
+            else:
+                collected = None  # Too large to cache; keep streaming
+        yield chunk
+    if collected is not None:
+        cache.set(key, b"".join(collected))
+
+def create_archive_cache() -> ArchiveCache:
+    return ArchiveCache(
+        max_bytes=env_int("ARCHIVE_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        max_entry_bytes=env_int("ARCHIVE_CACHE_MAX_ENTRY_BYTES", 16 * 1024 * 1024),
+    )